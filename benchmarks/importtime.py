@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+"""
+Import-time benchmark of the flow package.
+
+Imports flow in fresh interpreters with python -X importtime and reports
+the median cumulative import time of flow and of the slowest modules it
+pulls in. Heavy dependencies that must only be imported by the tasks
+using them (see the flow package docstring) are checked for; the script
+exits with status 1 if any of them is imported eagerly.
+
+Run from the repository root:
+
+    python benchmarks/importtime.py
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+repo_dir = Path(__file__).resolve().parents[1]
+
+deferred_modules = ["mako", "hjson", "lxml", "elftools", "asyncio", "multiprocessing"]
+
+def importtime(module: str) -> dict[str, int]:
+    """Returns cumulative import time in microseconds per imported module."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=repo_dir, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("-n", "--runs", type=int, default=5, help="number of interpreter runs")
+    parser.add_argument("-t", "--top", type=int, default=15, help="number of modules to list")
+    args = parser.parse_args()
+
+    runs = [importtime("flow") for _ in range(args.runs)]
+    median = {name: statistics.median(run.get(name, 0) for run in runs) for name in runs[0]}
+
+    print(f"Cumulative import time, median of {args.runs} runs:")
+    for name, us in sorted(median.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{us/1000:8.1f} ms  {name}")
+
+    eager = sorted(name for name in median if name.split('.')[0] in deferred_modules)
+    if eager:
+        print(f"\nEagerly imported: {', '.join(eager)}")
+        sys.exit(1)
+    print(f"\nNone of {', '.join(deferred_modules)} imported.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+"""
+Memory and time benchmark of reggen's data model (flow/tools/reggen/data.py).
+
+Builds the data model of the synthetic register block of
+reggen_validate.py with gen_rtl.json_to_reg and reports the memory it
+retains, the build time and the time of a pass reading all field
+attributes. With --ref, the same is measured with data.py of a git
+revision for comparison.
+
+Run from the repository root:
+
+    python benchmarks/reggen_data.py --ref HEAD~1
+"""
+
+import argparse
+import importlib.util
+import logging
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+repo_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_dir))
+
+from reggen_validate import synthetic_block
+
+data_classes = ['Field', 'Reg', 'MultiReg', 'Window', 'Block']
+
+def load_data_module(rev: str):
+    """Loads flow/tools/reggen/data.py of git revision rev as a module."""
+    source = subprocess.check_output(["git", "show", f"{rev}:flow/tools/reggen/data.py"],
+        cwd=repo_dir, text=True)
+    spec = importlib.util.spec_from_loader("flow.tools.reggen._data_ref", loader=None)
+    module = importlib.util.module_from_spec(spec)
+    module.__package__ = "flow.tools.reggen"
+    exec(compile(source, f"{rev}:data.py", 'exec'), module.__dict__)
+    if not hasattr(module.Block, 'precompute'):
+        # json_to_reg calls it since the flat tables are precomputed
+        module.Block.precompute = lambda self: None
+    return module
+
+def read_fields(block) -> int:
+    total = 0
+    for reg in block.get_regs_flat():
+        for f in reg.fields:
+            total += f.msb - f.lsb + f.resval + f.hwqe + f.hwre + f.hwext
+    return total
+
+def measure(gen_rtl, obj, runs: int):
+    tracemalloc.start()
+    block = gen_rtl.json_to_reg(obj)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    build_times = []
+    read_times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        block = gen_rtl.json_to_reg(obj)
+        build_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        read_fields(block)
+        read_times.append(time.perf_counter() - start)
+    n_fields = sum(len(reg.fields) for reg in block.get_regs_flat())
+    return n_fields, retained, statistics.median(build_times), statistics.median(read_times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("-f", "--fields", type=int, default=4096, help="number of fields")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="number of runs")
+    parser.add_argument("--ref", help="git revision to compare against")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    from flow.tools.reggen import validate, gen_rtl
+
+    obj = synthetic_block(args.fields)
+    if validate.validate(obj):
+        raise Exception("Synthetic block does not validate.")
+
+    variants = {"current": None}
+    if args.ref:
+        variants[args.ref] = load_data_module(args.ref)
+
+    print(f"{'data model':>12s}  {'fields':>6s}  {'memory':>10s}  {'json_to_reg':>11s}  {'read':>8s}")
+    current = {name: getattr(gen_rtl, name) for name in data_classes}
+    for label, module in variants.items():
+        if module:
+            for name in data_classes:
+                setattr(gen_rtl, name, getattr(module, name))
+        try:
+            n_fields, retained, build, read = measure(gen_rtl, obj, args.runs)
+        finally:
+            for name, cls in current.items():
+                setattr(gen_rtl, name, cls)
+        print(f"{label:>12s}  {n_fields:6d}  {retained/1024:7.0f} kB  {build*1000:8.1f} ms  {read*1000:5.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+"""
+Render-time benchmark of reggen's reg_pkg.sv and reg_top.sv templates.
+
+Renders the synthetic register block of reggen_validate.py for a range of
+field counts and reports the median time of json_to_reg and of rendering
+each template, together with the render time per field. Constant time per
+field means that rendering scales linearly with the block size.
+
+Run from the repository root:
+
+    python benchmarks/reggen_render.py
+"""
+
+import argparse
+import importlib.resources
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from reggen_validate import synthetic_block
+
+def median_time(func, runs: int):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("-f", "--fields", type=int, nargs='+', default=[1024, 2048, 4096, 8192],
+        help="numbers of fields")
+    parser.add_argument("-n", "--runs", type=int, default=3, help="number of runs")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    from flow.tools.reggen import validate, gen_rtl
+    from flow.tools.reggen.field_enums import HwAccess, SwRdAccess, SwWrAccess
+    from flow.tools.templates import load_template
+
+    pkg = importlib.resources.files(gen_rtl.__package__)
+    templates = {name: load_template(pkg / f'{name}.sv.tpl') for name in ['reg_pkg', 'reg_top']}
+
+    print(f"{'fields':>6s}  {'json_to_reg':>11s}  {'reg_pkg':>9s}  {'reg_top':>9s}  {'per field':>9s}")
+    for n_fields in args.fields:
+        obj = synthetic_block(n_fields)
+        if validate.validate(obj):
+            raise Exception("Synthetic block does not validate.")
+        build, block = median_time(lambda: gen_rtl.json_to_reg(obj), args.runs)
+        render = {}
+        for name, tpl in templates.items():
+            render[name], _ = median_time(lambda: tpl.render(block=block, HwAccess=HwAccess,
+                SwRdAccess=SwRdAccess, SwWrAccess=SwWrAccess), args.runs)
+        per_field = sum(render.values()) / n_fields
+        print(f"{n_fields:6d}  {build*1000:8.1f} ms  {render['reg_pkg']*1000:6.1f} ms  "
+            f"{render['reg_top']*1000:6.1f} ms  {per_field*1e6:6.1f} us")
+
+if __name__ == "__main__":
+    main()
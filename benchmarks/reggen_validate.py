@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+"""
+Benchmark of reggen's validate.validate on a synthetic register block.
+
+The block has a total of --fields fields: half of them in plain registers
+(two fields each, every eighth register protected by a regwen register),
+the other half in a multireg of 1-bit fields. The hjson is written to a
+temporary file and parsed like RegisterGenerator does.
+
+Run from the repository root:
+
+    python benchmarks/reggen_validate.py
+"""
+
+import argparse
+import copy
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+def synthetic_block(n_fields: int) -> dict:
+    """Returns hjson object of a register block with n_fields fields."""
+    n_regs = n_fields // 4
+    registers = [
+        { 'name': "CFG_REGWEN",
+          'desc': "Write enable of the configuration registers",
+          'swaccess': "rw0c",
+          'hwaccess': "none",
+          'fields': [{'bits': "0", 'resval': "1"}],
+        },
+    ]
+    for i in range(n_regs):
+        reg = {
+            'name': f"CFG{i}",
+            'desc': f"Configuration register {i}",
+            'swaccess': "rw",
+            'hwaccess': "hro",
+            'fields': [
+                {'bits': "15:0", 'name': "lo", 'desc': "Low half", 'resval': str(i & 0xffff)},
+                {'bits': "31:16", 'name': "hi", 'desc': "High half"},
+            ],
+        }
+        if i % 8 == 0:
+            reg['regwen'] = "CFG_REGWEN"
+        registers.append(reg)
+    registers.append({'multireg': {
+        'name': "FLAG",
+        'desc': "Flags",
+        'count': str(n_fields - 2*n_regs),
+        'cname': "FLAG",
+        'swaccess': "rw1c",
+        'hwaccess': "hrw",
+        'fields': [{'bits': "0", 'name': "f", 'desc': "Flag"}],
+    }})
+    return {
+        'name': "synth",
+        'clock_primary': "clk_i",
+        'bus_device': "tlul",
+        'regwidth': "32",
+        'registers': registers,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("-f", "--fields", type=int, default=4096, help="number of fields")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="number of validate runs")
+    args = parser.parse_args()
+
+    import hjson
+    from flow.tools.reggen import validate
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        hjson_fn = Path(tmpdir) / "synth.hjson"
+        with open(hjson_fn, 'w') as f:
+            hjson.dump(synthetic_block(args.fields), f)
+        start = time.perf_counter()
+        with open(hjson_fn) as f:
+            obj = hjson.load(f)
+        parse_time = time.perf_counter() - start
+
+    times = []
+    for _ in range(args.runs):
+        regs = copy.deepcopy(obj)
+        start = time.perf_counter()
+        error = validate.validate(regs)
+        times.append(time.perf_counter() - start)
+        if error:
+            raise Exception(f"validate returned {error}.")
+
+    print(f"{args.fields} fields, {len(regs['genrnames'])} registers")
+    print(f"hjson parse: {parse_time*1000:8.1f} ms")
+    print(f"validate:    {statistics.median(times)*1000:8.1f} ms (median of {args.runs} runs)")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
 # SPDX-License-Identifier: Apache-2.0
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
+"""
+RVLab design flow.
+
+Every flow invocation imports this package and all modules of its blocks.
+Dependencies that are slow to import (mako, hjson, lxml, pyelftools,
+asyncio, multiprocessing) are therefore imported in the functions using
+them, not at module level; benchmarks/importtime.py checks this.
+"""
+
 from pydesignflow import Flow
 
 from .rvlab_fpga_top import RvlabFpgaTop
-from .system_tb import SystemTb
+from .system_tb import SystemTb, SystemTbRegression
 from .xbar import XbarGenerator
-from .sw import Program, Libsys
+from .sw import Program, Libsys, SwAll
 from .simlibs_questa import SimlibsQuesta
 from .module_tb import ModuleTb
 from .sources import Sources
@@ -30,10 +39,19 @@ sw_dirs = [
     "project",
 ]
 
+# Large programs are loaded into simulation using the binary delta format:
+sw_dirs_bin_delta = [
+    "coremark",
+    "dma",
+]
+
 flow['libsys'] = Libsys(dependency_map={'reggen': 'reggen'})
 for sw_dir in sw_dirs:
-    flow[f'sw_{sw_dir}'] = Program(sw_dir, dependency_map={
-        'libsys':'libsys', 'ref':'sw_test_rvlab', 'reggen': 'reggen'})
+    flow[f'sw_{sw_dir}'] = Program(sw_dir,
+        delta_format="bin" if sw_dir in sw_dirs_bin_delta else "text",
+        dependency_map={'libsys':'libsys', 'ref':'sw_test_rvlab', 'reggen': 'reggen'})
+flow['sw_all'] = SwAll([f'sw_{sw_dir}' for sw_dir in sw_dirs],
+    dependency_map={'libsys':'libsys', 'reggen': 'reggen'})
 
 # Hardware
 # --------
@@ -73,3 +91,10 @@ for sw_dir in sw_dirs:
         'simlibs_questa':'simlibs_questa',
         'fpga_top':'rvlab_fpga_top',
     })
+
+flow['systb_all'] = SystemTbRegression([f'systb_{sw_dir}' for sw_dir in sw_dirs],
+    dependency_map={
+        'srcs':'srcs',
+        'sw_all':'sw_all',
+        'simlibs_questa':'simlibs_questa',
+    })
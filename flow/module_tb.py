@@ -3,6 +3,7 @@
 
 from pydesignflow import Block, task, Result
 from .tools import questasim, xsim, vivado
+from .tools.buildcache import cache_root
 
 class ModuleTb(Block):
     """Module-level testbench"""
@@ -21,8 +22,13 @@ class ModuleTb(Block):
         verilog_srcs = srcs.design_srcs + srcs.tb_srcs
         top_modules = [self.name, 'glbl']
 
+        kwargs = {}
+
         if simulator == 'questasim':
             sim = questasim.simulate
+            kwargs['compile_cache'] = cache_root(cwd) / "questa"
+            # Batch runs need no visibility for waves, so fully optimize:
+            kwargs['acc'] = None if batch else "+acc"
             wave_do = self.design_dir / f"wave/{self.name}.do"
         elif simulator == 'xsim':
             sim = xsim.simulate
@@ -39,6 +45,7 @@ class ModuleTb(Block):
             libs=libs,
             batch_mode=batch,
             wave_do=wave_do,
+            **kwargs
             )
 
     # QuestaSim tasks
@@ -48,19 +55,19 @@ class ModuleTb(Block):
     def sim_rtl_questa(self, cwd, srcs, unisims):
         """RTL simulation with QuestaSim"""
         self.simulate('questasim', cwd, srcs,
-            libs=[unisims.lib])
+            libs=unisims.libs)
 
     @task(requires={'srcs':'srcs.srcs', 'unisims':'simlibs_questa.unisims', 'secureip':'simlibs_questa.secureip'})
     def sim_rtl_questa_ddr(self, cwd, srcs, unisims, secureip):
         """RTL simulation with QuestaSim, including libraries required for simulating the DDR3 model"""
         self.simulate('questasim', cwd, srcs,
-            libs=[unisims.lib, secureip.lib])
+            libs=unisims.libs + secureip.libs)
 
     @task(requires={'srcs':'srcs.srcs_noddr', 'unisims':'simlibs_questa.unisims'}, hidden=True)
     def sim_rtl_questa_batch(self, cwd, srcs, unisims):
         """RTL simulation with QuestaSim (batch mode)"""
         self.simulate('questasim', cwd, srcs,
-            libs=[unisims.lib],
+            libs=unisims.libs,
             batch=True)
 
     # Vivado XSim tasks
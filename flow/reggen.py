@@ -3,19 +3,36 @@
 
 from pydesignflow import Block, task, Result
 import re
+from pathlib import Path
 from .tools.reggen_wrapper import run_reggen
+from .tools.buildcache import Manifest, cache_root, restore_outputs, store_outputs
+from .tools.genpool import run_generators
+
+def generator_files() -> list[Path]:
+    """Returns the reggen sources and templates, which determine the outputs besides the hjson."""
+    tools_dir = Path(__file__).parent / "tools"
+    files = [tools_dir / "reggen_wrapper.py"]
+    files += sorted(f for f in (tools_dir / "reggen").rglob("*") if f.is_file() and f.suffix != ".pyc")
+    return files
 
 class RegisterGenerator(Block):
     """Register generator using OpenTitan's reggen"""
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, processes=None, **kwargs):
+        """
+        Args:
+            processes: Number of worker processes for generating register
+                blocks in parallel (see run_generators). 1 generates all
+                blocks in the flow process.
+        """
         super().__init__(*args, **kwargs)
+        self.processes = processes
 
     def setup(self):
         self.src_dir = self.flow.base_dir / "src"
         self.design_dir = self.src_dir / "design"
     
     def find_reggens(self):
-        for input_hjson_fn in (self.design_dir / "reggen").iterdir():
+        for input_hjson_fn in sorted((self.design_dir / "reggen").iterdir()):
             m = re.match(r"(.*)\.hjson", input_hjson_fn.name)
             if not m:
                 continue
@@ -24,7 +41,15 @@ class RegisterGenerator(Block):
 
     @task()
     def generate(self, cwd):
-        """Generate SystemVerilog + C headers"""
+        """
+        Generate SystemVerilog + C headers
+
+        The outputs of each register block are cached together with a
+        manifest of its hjson and the generator sources. Blocks whose
+        manifest is unchanged are restored from cache byte-for-byte and with
+        their original modification times instead of being regenerated.
+        The other blocks are generated in parallel worker processes.
+        """
         r = Result()
         r.c_include_dir = cwd / 'include'
         header_dir = r.c_include_dir / 'reggen'
@@ -36,15 +61,36 @@ class RegisterGenerator(Block):
         outdir_html = cwd / 'html'
         outdir_html.mkdir()
 
-        for name, input_hjson_fn in self.find_reggens():
-            print(f"Generating TL-UL register module and C headers for {name}...")
+        generator = Manifest()
+        generator.add_files(generator_files())
 
+        jobs = {}
+        pending = []
+        for name, input_hjson_fn in self.find_reggens():
             top_sv = outdir_rtl / f"{name}_reg_top.sv"
             pkg_sv = outdir_rtl / f"{name}_reg_pkg.sv"
             header = header_dir / f'{name}.h'
             html = outdir_html / f'{name}.html'
+            outputs = [pkg_sv, top_sv, header, html]
+
+            cache_dir = cache_root(cwd) / self.id / name
+            manifest_fn = cache_dir / "manifest.json"
+            manifest = Manifest()
+            manifest.add_file(input_hjson_fn)
+            manifest.add_value("generator", generator.digest())
+
+            if manifest == Manifest.load(manifest_fn) and restore_outputs(cache_dir, outputs):
+                print(f"Register block {name} is up to date, using outputs of previous run.")
+            else:
+                print(f"Generating TL-UL register module and C headers for {name}...")
+                jobs[input_hjson_fn.name] = (run_reggen, (input_hjson_fn, pkg_sv, top_sv, header, html))
+                pending.append((cache_dir, outputs, manifest))
 
-            run_reggen(input_hjson_fn, pkg_sv, top_sv, header, html)
             r.rtl_srcs += [pkg_sv, top_sv]
-            
+
+        run_generators(jobs, self.processes)
+        for cache_dir, outputs, manifest in pending:
+            store_outputs(cache_dir, outputs)
+            manifest.save(cache_dir / "manifest.json")
+
         return r
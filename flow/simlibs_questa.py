@@ -3,24 +3,70 @@
 
 from pydesignflow import Block, task, Result
 from .tools import questasim, vivado
+from .tools.buildcache import user_cache_dir, populate_once
 from pathlib import Path
+import hashlib
+import json
 import os
 
 class SimlibsQuesta(Block):
     """Xilinx simulation cell libraries for QuestaSim"""
 
+    def __init__(self, shards: int=None, **kwargs):
+        """
+        Args:
+            shards: Number of parallel vlog processes per library (see
+                questasim.compile_sharded). Defaults to the CPU count.
+        """
+        super().__init__(**kwargs)
+        self.shards = shards or os.cpu_count() or 1
+
     def unisims_srcs(self):
         # unisims and simprims share the same Verilog sources.
         # They differ only in XIL_TIMING being set or not set.
         unisims_dir = vivado.vivado_dir() / "data/verilog/src/unisims"
         return [str(fn) for fn in unisims_dir.glob("*.v")]
 
+    def libraries(self, srcs, lib_name, defines={}) -> list[Path]:
+        """
+        Returns the shards of the compiled library lib_name, taking them
+        from the machine-wide simlib cache (questa_simlibs/ in
+        user_cache_dir) and compiling them into the cache first if they are
+        not there yet.
+
+        Cache entries are keyed by Vivado version, vlog version, defines and
+        the names (relative to the Vivado directory) and sizes of the library
+        sources, so different Vivado and QuestaSim installations and
+        machines can share one cache. The sources of a Vivado release do not
+        change, so they are not hashed. The shard count is not part of the
+        key: an entry holds the shards it was compiled with.
+        """
+        vivado_dir = vivado.vivado_dir()
+        key = {
+            'vivado': vivado.vivado_version(),
+            'vlog': questasim.vlog_version(),
+            'defines': defines,
+            'srcs': {str(Path(src).relative_to(vivado_dir)): os.path.getsize(src) for src in sorted(srcs)},
+        }
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+        entry_dir = user_cache_dir() / "questa_simlibs" / f"{lib_name}-{key['vivado']}-{digest[:16]}"
+
+        def populate(tmp_dir):
+            questasim.compile_sharded(srcs, tmp_dir, lib_name, self.shards, defines=defines)
+
+        if populate_once(entry_dir, populate):
+            print(f"Compiled {lib_name} library to {entry_dir}.")
+        else:
+            print(f"Using cached {lib_name} library {entry_dir}.")
+        libs = [lib for lib in entry_dir.iterdir() if lib.is_dir()]
+        return sorted(libs, key=lambda lib: int(lib.name.rpartition('_')[2]))
+
     @task(hidden=True)
     def unisims(self, cwd):
         """Library for functional simulation"""
         srcs = self.unisims_srcs()
         r = Result()
-        r.lib = questasim.compile(srcs, cwd, 'unisims')
+        r.libs = self.libraries(srcs, 'unisims')
         return r
 
     @task(hidden=True)
@@ -28,7 +74,7 @@ class SimlibsQuesta(Block):
         """Library for timing-annotated netlist simulation"""
         srcs = self.unisims_srcs()
         r = Result()
-        r.lib = questasim.compile(srcs, cwd, 'simprims', defines={'XIL_TIMING':1})
+        r.libs = self.libraries(srcs, 'simprims', defines={'XIL_TIMING':1})
         return r
 
     @task(hidden=True)
@@ -38,5 +84,5 @@ class SimlibsQuesta(Block):
         srcs = [str(fn) for fn in secureip_dir.glob("**/*.vp")]
         print(srcs)
         r = Result()
-        r.lib = questasim.compile(srcs, cwd, 'secureip', defines={'XIL_TIMING':1})
+        r.libs = self.libraries(srcs, 'secureip', defines={'XIL_TIMING':1})
         return r
@@ -1,12 +1,19 @@
 # SPDX-License-Identifier: Apache-2.0
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pydesignflow import Block, task, Result
 from .tools.build_sw import build_sw, build_static_lib
-from .tools.elf2mem import elfdelta
-from .tools import openocd
+from .tools.elf2mem import elfdelta, elf_size
 from pathlib import Path
 from .tools.overlay import filter_solutions_overlay
+from .tools.buildcache import cache_root
+from .tools.toolchain import toolchain_cache_file
+from .tools.prefixlog import prefixed_stdout
+from .tools.table import print_table
 
 class Libsys(Block):
     """
@@ -26,7 +33,7 @@ class Libsys(Block):
         sw_dir = self.src_dir / "sw"
         sys_src_dir = sw_dir / "sys"
         sys_include_dir = sw_dir / "include"
-        srcs = list(sys_src_dir.glob("*.c"))
+        srcs = sorted(sys_src_dir.glob("*.c"))
 
         r.lib = cwd / "libsys.a"
 
@@ -36,6 +43,9 @@ class Libsys(Block):
                 reggen.c_include_dir,
             ],
             include_quote=[],
+            object_cache_dir=cache_root(cwd) / "objects",
+            cache_dir=cache_root(cwd) / self.id,
+            toolchain_cache=toolchain_cache_file(),
         )
 
         return r
@@ -43,14 +53,18 @@ class Libsys(Block):
 class Program(Block):
     """Program for the RISC-V CPU"""
 
-    def __init__(self, name, **kwargs):
+    def __init__(self, name, delta_format="text", **kwargs):
         """
         Args:
             name: Name of src/sw/ subdirectory containing program-specific
                 sources files.
+            delta_format: Format of the differential image produced by the
+                delta task, "text" or "bin" (compact, loaded in SBA
+                bursts without busy polling per word in simulation).
         """
         super().__init__(**kwargs)
         self.name = name
+        self.delta_format = delta_format
 
     def setup(self):
         self.src_dir = self.flow.base_dir / "src"
@@ -63,6 +77,22 @@ class Program(Block):
     def build(self, cwd, libsys, reggen):
         """
         Main program for simulation and later use on FPGA.
+
+        The build is skipped if no input changed since the previous build
+        (see build_sw's cache_dir).
+        """
+        cache = cache_root(cwd)
+        return self.build_program(cwd, libsys, reggen, cache, cache / self.id)
+
+    def build_program(self, cwd, libsys, reggen, cache, cache_dir, jobs=None):
+        """
+        Builds the program into cwd. Also used by SwAll to build all programs
+        in one task.
+
+        Args:
+            cache: Persistent cache directory (see cache_root).
+            cache_dir: Output cache directory of this build (see build_sw).
+            jobs: Maximum number of concurrent compiler processes.
         """
         r = Result()
 
@@ -73,12 +103,12 @@ class Program(Block):
         user_includes = sw_dir / "include"
 
         srcs = []
-        srcs += list(main_dir.glob("*.S"))
-        srcs += list(main_dir.glob("*.c"))
+        srcs += sorted(main_dir.glob("*.S"))
+        srcs += sorted(main_dir.glob("*.c"))
 
         # Shared source files in sw/ folder:
-        srcs += list(sw_dir.glob("*.S")) # should be [crt0.S] at the moment
-        srcs += list(sw_dir.glob("*.c")) # should be [hostio.c] at the moment
+        srcs += sorted(sw_dir.glob("*.S")) # should be [crt0.S] at the moment
+        srcs += sorted(sw_dir.glob("*.c")) # should be [hostio.c] at the moment
 
         srcs = filter_solutions_overlay(srcs, self.src_dir)
 
@@ -86,7 +116,7 @@ class Program(Block):
         r.mem = cwd / "sw.mem"
         r.disasm = cwd / "sw.disasm"
 
-        build_sw(
+        r.built = build_sw(
             cwd=cwd,
             srcs=srcs,
             ldscript=ldscript,
@@ -99,6 +129,10 @@ class Program(Block):
                 reggen.c_include_dir,
             ],
             include_quote=[],
+            cache_dir=cache_dir,
+            object_cache_dir=cache / "objects",
+            toolchain_cache=toolchain_cache_file(),
+            jobs=jobs,
         )
 
         return r
@@ -106,6 +140,7 @@ class Program(Block):
     @task(requires={'build':'.build'})
     def run(self, cwd, build):
         """Run on FPGA via OpenOCD"""
+        from .tools import openocd
         with openocd.start(self.design_dir / "openocd/fpga.cfg") as ocd:
             ocd.run_prog(build.elf)
             #input("Press enter to continue...")
@@ -113,7 +148,88 @@ class Program(Block):
     @task(requires={'build':'.build', 'ref_build':'ref.build'}, hidden=True, always_rebuild=True)
     def delta(self, cwd, build, ref_build):
         """Differential image for fast loading in simulator"""
+        return self.make_delta(cwd, build.elf, ref_build.elf)
+
+    def make_delta(self, cwd, elf, ref_elf):
+        """
+        Writes the differential image of elf relative to ref_elf (the
+        program preloaded in simulation) to cwd. Returns a Result like the
+        delta task.
+        """
+        r = Result()
+        if self.delta_format == "bin":
+            r.deltafile = cwd / "delta.bin"
+        else:
+            r.deltafile = cwd / "delta"
+        summary = elfdelta(elf, ref_elf, r.deltafile, fmt=self.delta_format)
+        r.words_sent = summary.words_sent
+        r.words_skipped = summary.words_skipped
+        return r
+
+class SwAll(Block):
+    """All programs, built concurrently"""
+
+    def __init__(self, program_ids, **kwargs):
+        """
+        Args:
+            program_ids: Block IDs of the Program blocks to build.
+        """
+        super().__init__(**kwargs)
+        self.program_ids = program_ids
+
+    @task(requires={
+        'libsys':'libsys.build',
+        'reggen':'reggen.generate',
+        }, always_rebuild=True)
+    def build(self, cwd, libsys, reggen):
+        """
+        Builds libsys once and then all programs concurrently.
+
+        Output lines of each program are prefixed with its block ID. Each
+        program is built in a subdirectory of cwd; unchanged programs are
+        taken from cache as in Program.build.
+        """
         r = Result()
-        r.deltafile = cwd / "delta"
-        elfdelta(build.elf, ref_build.elf, r.deltafile)
+        cache = cache_root(cwd)
+
+        workers = min(len(self.program_ids), os.cpu_count() or 1)
+        jobs = max(1, (os.cpu_count() or 1) // workers)
+
+        def build_one(out, prog_id):
+            prog_dir = cwd / prog_id
+            prog_dir.mkdir()
+            start = time.perf_counter()
+            with out.prefix(f"[{prog_id}] "):
+                try:
+                    res = self.flow[prog_id].build_program(prog_dir, libsys, reggen,
+                        cache, cache / self.id / prog_id, jobs)
+                except Exception:
+                    traceback.print_exc(file=out)
+                    return None, time.perf_counter() - start
+            return res, time.perf_counter() - start
+
+        with prefixed_stdout() as out:
+            with ThreadPoolExecutor(workers) as pool:
+                futures = [pool.submit(build_one, out, prog_id) for prog_id in self.program_ids]
+                results = [future.result() for future in futures]
+
+        elfs = {}
+        failed = []
+        rows = []
+        for prog_id, (res, duration) in zip(self.program_ids, results):
+            if res is None:
+                failed.append(prog_id)
+                rows.append((prog_id, "-", "-", "-", "-", f"{duration:.2f}s", "FAILED"))
+                continue
+            elfs[prog_id] = res.elf
+            size = elf_size(res.elf)
+            rows.append((prog_id, size.text, size.data, size.bss, sum(size),
+                f"{duration:.2f}s", "built" if res.built else "cached"))
+
+        print_table(("program", "text", "data", "bss", "total", "time", "status"), rows)
+
+        if failed:
+            raise Exception(f"Failed to build: {', '.join(failed)}")
+
+        r.elf = elfs
         return r
@@ -3,7 +3,51 @@
 
 from pydesignflow import Block, task, Result
 from .tools import questasim, xsim, vivado
+from .tools.buildcache import cache_root
+from .tools.table import print_table
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
 import shutil
+import time
+import traceback
+
+TestResult = namedtuple('TestResult', ['name', 'passed', 'errcnt'])
+SimOutcome = namedtuple('SimOutcome', ['systb_id', 'tests', 'returncode', 'duration', 'log'])
+
+re_test_line = re.compile(r'^(?:# )?\[(pass|FAIL|    )\] (.+?)(?:, errcnt=\s*(-?\d+))?\s*$')
+
+def parse_test_results(output: str) -> list[TestResult]:
+    """
+    Returns the results reported by test_start / test_end of
+    rvlab_test_utils.sv in simulation output, in order of appearance.
+    Tests that were started but did not end have passed=None.
+    """
+    tests = {}
+    for line in output.splitlines():
+        m = re_test_line.match(line)
+        if not m:
+            continue
+        status, name, errcnt = m.groups()
+        if status == "    ":
+            tests.setdefault(name, TestResult(name, None, None))
+        else:
+            tests[name] = TestResult(name, status == "pass", int(errcnt or 0))
+    return list(tests.values())
+
+def compile_options(srcs) -> dict:
+    """Returns the include dirs and defines for compiling srcs."""
+    return dict(include_dirs=srcs.include_dirs, defines=srcs.defines)
+
+def sim_status(outcome: SimOutcome) -> str:
+    if outcome.returncode is None:
+        return "TIMEOUT"
+    if outcome.returncode != 0 or not outcome.tests or any(t.passed is None for t in outcome.tests):
+        return "ERROR"
+    if not all(t.passed for t in outcome.tests):
+        return "FAIL"
+    return "pass"
 
 class SystemTb(Block):
     """System testbench"""
@@ -13,12 +57,25 @@ class SystemTb(Block):
         self.src_dir = self.flow.base_dir / "src"
         self.design_dir = self.src_dir / "design"
 
+    @property
+    def top_modules(self) -> list[str]:
+        return [self.name, 'glbl']
+
+    def sim_setup(self, sim_dir, sw) -> tuple[list[str], dict]:
+        """
+        Prepares sim_dir for simulating program sw (a delta result) and
+        returns the top modules and plusargs of the simulation.
+        """
+        # Copy XADC temperature input file
+        shutil.copyfile(
+            self.design_dir / "ip/design.txt",
+            sim_dir / 'design.txt'
+        )
+        return self.top_modules, {"jtag_prog_mem":sw.deltafile}
+
     def simulate(self, simulator, cwd, srcs, sw, libs=[], netlist=None, sdf={}, batch=False):
         """Generic function that is called by all sim_... tasks."""
 
-        plusargs = {"jtag_prog_mem":sw.deltafile}
-        top_modules = [self.name, 'glbl']
-
         verilog_srcs = srcs.design_srcs + srcs.tb_srcs
         if netlist:
             verilog_srcs.append(netlist)
@@ -27,6 +84,9 @@ class SystemTb(Block):
 
         if simulator == 'questasim':
             sim = questasim.simulate
+            kwargs['compile_cache'] = cache_root(cwd) / "questa"
+            # Batch runs need no visibility for waves, so fully optimize:
+            kwargs['acc'] = None if batch else "+acc"
             wave_do = [
                 self.design_dir / f"wave/riscv.radix.do",
                 self.design_dir / f"wave/{self.name}.do",
@@ -36,24 +96,19 @@ class SystemTb(Block):
             wave_do = self.design_dir / f"wave/{self.name}.xsim.wcfg"
         else:
             raise ValueError(f"Unknown simulator '{simulator}'")
-        
-        # Copy XADC temperature input file
-        shutil.copyfile(
-            self.design_dir / "ip/design.txt",
-            cwd / 'design.txt'
-        )
+
+        top_modules, plusargs = self.sim_setup(cwd, sw)
 
         sim(
             verilog_srcs,
             top_modules,
             cwd=cwd,
-            include_dirs=srcs.include_dirs,
-            defines=srcs.defines,
             plusargs=plusargs,
             libs=libs,
             batch_mode=batch,
             sdf=sdf,
             wave_do=wave_do,
+            **compile_options(srcs),
             **kwargs
             )
 
@@ -68,7 +123,7 @@ class SystemTb(Block):
     def sim_rtl_questa(self, cwd, srcs, sw, unisims):
         """RTL simulation with QuestaSim"""
         self.simulate('questasim', cwd, srcs, sw,
-            libs=[unisims.lib])
+            libs=unisims.libs)
 
     @task(requires={
         'srcs':'srcs.srcs',
@@ -79,7 +134,7 @@ class SystemTb(Block):
     def sim_rtl_questa_ddr(self, cwd, srcs, sw, unisims, secureip):
         """RTL simulation with QuestaSim including DDR3"""
         self.simulate('questasim', cwd, srcs, sw,
-            libs=[unisims.lib, secureip.lib])
+            libs=unisims.libs + secureip.libs)
 
     @task(requires={
         'srcs':'srcs.srcs_noddr',
@@ -89,7 +144,7 @@ class SystemTb(Block):
     def sim_rtl_questa_batch(self, cwd, srcs, sw, unisims):
         """RTL simulation with QuestaSim (batch mode)"""
         self.simulate('questasim', cwd, srcs, sw,
-            libs=[unisims.lib],
+            libs=unisims.libs,
             batch=True)
 
     @task(requires={
@@ -103,7 +158,7 @@ class SystemTb(Block):
         """Post-synthesis functional simulation with QuestaSim"""
         self.simulate(
             'questasim', cwd, srcs, sw,
-            libs=[unisims.lib, secureip.lib],
+            libs=unisims.libs + secureip.libs,
             netlist=syn.verilog_funcsim)
 
     @task(requires={
@@ -116,7 +171,7 @@ class SystemTb(Block):
     def sim_pnrtime_questa(self, cwd, srcs, sw, simprims, secureip, pnr):
         """Post-PNR timing simulation with QuestaSim"""
         self.simulate('questasim', cwd, srcs, sw,
-            libs=[simprims.lib, secureip.lib],
+            libs=simprims.libs + secureip.libs,
             netlist=pnr.verilog_timesim,
             sdf={'system_tb/board/DUT':pnr.sdf})
 
@@ -164,3 +219,135 @@ class SystemTb(Block):
             libs=['simprims_ver', 'secureip'], # Xilinx XSim has this as builtin library.
             netlist=pnr.verilog_timesim,
             sdf={'system_tb/board/DUT':pnr.sdf})
+
+class SystemTbRegression(Block):
+    """Regression of all system testbenches"""
+
+    def __init__(self, systb_ids, workers: int=None, timeout: float=3600, **kwargs):
+        """
+        Args:
+            systb_ids: Block IDs of the SystemTb blocks to simulate.
+            workers: Maximum number of concurrent simulations. Defaults to
+                the CPU count.
+            timeout: Seconds after which a simulation is killed.
+        """
+        super().__init__(**kwargs)
+        self.systb_ids = systb_ids
+        self.workers = workers
+        self.timeout = timeout
+
+    @task(requires={
+        'srcs':'srcs.srcs_noddr',
+        'sw_all':'sw_all.build',
+        'unisims':'simlibs_questa.unisims',
+        }, always_rebuild=True)
+    def sim_rtl_questa(self, cwd, srcs, sw_all, unisims):
+        """
+        Batch RTL simulation of all system testbenches with QuestaSim.
+
+        The design is compiled and optimized (without +acc) once, then the
+        simulations run concurrently, each in a subdirectory of cwd named
+        after its block. Results of test_end are summarized on the console
+        and in junit.xml.
+        """
+        r = Result()
+        systb = self.flow[self.systb_ids[0]]
+        libs = unisims.libs
+        prepared = questasim.prepare(
+            srcs.design_srcs + srcs.tb_srcs,
+            systb.top_modules,
+            cwd,
+            cache_root(cwd) / "questa",
+            libs=libs,
+            acc=None,
+            **compile_options(srcs),
+            )
+
+        def simulate_one(systb_id):
+            sim_dir = cwd / systb_id
+            sim_dir.mkdir()
+            start = time.perf_counter()
+            try:
+                tb = self.flow[systb_id]
+                prog_id = tb.dependency_map['sw']
+                prog = self.flow[prog_id]
+                delta = prog.make_delta(sim_dir, sw_all.elf[prog_id], sw_all.elf[prog.dependency_map['ref']])
+                # The design is compiled once with the top modules of systb.
+                _, plusargs = tb.sim_setup(sim_dir, delta)
+                (sim_dir / "work").symlink_to(lib)
+                returncode = questasim.run_batch(design, sim_dir, libs,
+                    plusargs=plusargs, timeout=self.timeout,
+                    acc=None, optimized=optimized)
+                with open(sim_dir / "vsim.log", errors='replace') as f:
+                    tests = parse_test_results(f.read())
+            except Exception:
+                traceback.print_exc()
+                returncode, tests = -1, []
+            outcome = SimOutcome(systb_id, tests, returncode, time.perf_counter() - start, sim_dir / "vsim.log")
+            print(f"{systb_id}: {sim_status(outcome)} ({outcome.duration:.1f}s)")
+            return outcome
+
+        workers = self.workers or min(len(self.systb_ids), os.cpu_count() or 1)
+        with prepared as (design, optimized):
+            lib = (cwd / "work").resolve()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(workers) as pool:
+                outcomes = list(pool.map(simulate_one, self.systb_ids))
+            duration = time.perf_counter() - start
+
+        r.junit = cwd / "junit.xml"
+        write_junit(r.junit, outcomes)
+
+        rows = []
+        for o in outcomes:
+            passed = sum(1 for t in o.tests if t.passed)
+            failed = [f"{t.name} (errcnt={t.errcnt})" for t in o.tests if t.passed is False]
+            rows.append((o.systb_id, len(o.tests), passed, f"{o.duration:.1f}s", sim_status(o), ", ".join(failed)))
+        print_table(("testbench", "tests", "passed", "time", "status", "failed tests"), rows, left=(0, 5))
+        print(f"\n{len(outcomes)} simulations with {workers} workers in {duration:.1f}s, report: {r.junit}")
+
+        failed = [o.systb_id for o in outcomes if sim_status(o) != "pass"]
+        if failed:
+            raise Exception(f"Regression failed: {', '.join(failed)}")
+
+        return r
+
+def write_junit(filename, outcomes: list[SimOutcome]):
+    """
+    Writes JUnit XML with one test suite per simulation and one test case
+    per test. Tests that did not end are errors. A simulation that timed
+    out or failed without an unfinished test is recorded as an error of a
+    test case named 'simulation'.
+    """
+    from xml.etree import ElementTree as ET
+
+    suites = ET.Element('testsuites')
+    for o in outcomes:
+        suite = ET.SubElement(suites, 'testsuite', name=o.systb_id, time=f"{o.duration:.3f}")
+        if o.returncode is None:
+            problem = "simulation timed out"
+        elif o.returncode != 0:
+            problem = f"vsim exited with code {o.returncode}"
+        elif not o.tests:
+            problem = "no test results"
+        else:
+            problem = None
+        failures = errors = 0
+        for t in o.tests:
+            case = ET.SubElement(suite, 'testcase', classname=o.systb_id, name=t.name)
+            if t.passed is False:
+                ET.SubElement(case, 'failure', message=f"errcnt={t.errcnt}")
+                failures += 1
+            elif t.passed is None:
+                ET.SubElement(case, 'error', message=f"test did not end ({problem or 'no test_end'}), see {o.log}")
+                errors += 1
+                problem = None
+        if problem:
+            case = ET.SubElement(suite, 'testcase', classname=o.systb_id, name="simulation")
+            ET.SubElement(case, 'error', message=f"{problem}, see {o.log}")
+            errors += 1
+        suite.set('tests', str(len(suite)))
+        suite.set('failures', str(failures))
+        suite.set('errors', str(errors))
+    ET.indent(suites)
+    ET.ElementTree(suites).write(filename, encoding='utf-8', xml_declaration=True)
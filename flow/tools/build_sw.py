@@ -1,29 +1,28 @@
 # SPDX-License-Identifier: Apache-2.0
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
+import hashlib
+import os
 import shutil
 import shlex
 import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from .elf2mem import elf2mem
-
-command = 'ls'
-shutil.which(command) is not None
+from .buildcache import Manifest, DependencyGraph, parse_depfile, restore_outputs, store_outputs
+from .toolchain import Toolchain, probe_toolchain
 
 cfg_arch = "rv32imc_zicsr"
 cfg_abi  = "ilp32"
 
-def find_toolchain_prefix():
-    prefixes_with_ziczr_compat = [
-        ("riscv-none-elf-", True),
-        ("riscv32-unknown-elf-", True),
-        ("riscv-none-embed-", False),
-    ]
-    for prefix, zicsr_compat in prefixes_with_ziczr_compat:
-        if shutil.which(f"{prefix}gcc"):
-            return prefix, zicsr_compat
-    raise Exception("Could not find RISC-V GCC toolchain.")
-
+def find_headers(include_dirs: list[Path]) -> list[Path]:
+    headers = []
+    for path in include_dirs:
+        headers += sorted(Path(path).rglob("*.h"))
+    return headers
 
 def get_cflags(abi, arch, funciton_sections=True):
     o = [
@@ -44,65 +43,306 @@ def get_cflags(abi, arch, funciton_sections=True):
     #    o+=["-ffunction-sections"]
     return o
 
+CompiledObject = namedtuple('CompiledObject', ['path', 'key', 'cached'])
+
+def run_captured(cmdline, cwd) -> str:
+    """
+    Runs cmdline and returns its combined stdout and stderr. On failure,
+    subprocess.CalledProcessError is raised with the output attached.
+    """
+    proc = subprocess.run(cmdline, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmdline, output=proc.stdout)
+    return proc.stdout
+
+def check_call(cmdline, cwd):
+    """
+    Like subprocess.check_call, but the output is passed through sys.stdout,
+    so that it can be redirected (see prefixlog).
+    """
+    try:
+        sys.stdout.write(run_captured(cmdline, cwd))
+    except subprocess.CalledProcessError as e:
+        sys.stdout.write(e.output)
+        raise
+
+def store_atomic(src: Path, dst: Path):
+    """
+    Copies src to dst so that concurrent readers never see a partial file.
+    The temporary file is unique, as concurrent writers (e.g. the threads of
+    SwAll.build) may store the same object.
+    """
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, prefix=f"{dst.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def compile_object(cwd, src: Path, cc_flags: list[str], toolchain: Toolchain, object_cache_dir: Path=None,
+    graph: DependencyGraph=None):
+    """
+    Compiles src to cwd/<stem>.o.
+
+    With object_cache_dir, the object is looked up by a key derived from
+    the preprocessed source, cc_flags and the toolchain version before
+    compiling, and stored under that key after compiling.
+
+    With graph, the preprocessor also writes a dependency file (-MD), from
+    which the source's dependencies are recorded in graph. As long as none
+    of them changes, the key recorded in graph is used without running the
+    preprocessor.
+
+    Returns:
+        (CompiledObject, compiler command line or None if cached, compiler output)
+    """
+    obj = cwd / f"{src.stem}.o"
+    cc_cmdline = [toolchain.gcc, "-c", str(src), "-o", str(obj)] + cc_flags
+    if not object_cache_dir:
+        output = run_captured(cc_cmdline, cwd)
+        return CompiledObject(obj, None, False), cc_cmdline, output
+
+    flags = shlex.join([toolchain.version] + cc_flags)
+    key = graph.lookup(src, flags) if graph else None
+    if not (key and (object_cache_dir / f"{key}.o").exists()):
+        depfile = cwd / f"{src.stem}.d"
+        pp_cmdline = [toolchain.gcc, "-E", str(src)] + cc_flags
+        if graph:
+            # -MD rather than -MMD: include directories are passed with
+            # -isystem, and -MMD would leave out all headers found there.
+            pp_cmdline += ["-MD", "-MF", str(depfile), "-MT", obj.name]
+        h = hashlib.sha256()
+        h.update(toolchain.version.encode())
+        h.update(shlex.join(cc_flags).encode())
+        h.update(src.suffix.encode())
+        h.update(subprocess.check_output(pp_cmdline, cwd=cwd))
+        key = h.hexdigest()
+        if graph:
+            graph.record(src, flags, parse_depfile(depfile, cwd), key)
+
+    cached_obj = object_cache_dir / f"{key}.o"
+    if cached_obj.exists():
+        shutil.copyfile(cached_obj, obj)
+        return CompiledObject(obj, key, True), None, ''
+    output = run_captured(cc_cmdline, cwd)
+    store_atomic(obj, cached_obj)
+    return CompiledObject(obj, key, False), cc_cmdline, output
+
+def compile_objects(cwd, srcs: list[Path], cc_flags: list[str], toolchain: Toolchain,
+    object_cache_dir: Path=None, jobs: int=None, graph: DependencyGraph=None) -> list[CompiledObject]:
+    """
+    Compiles each source file with its own compiler process, running up to
+    jobs (default: CPU count) processes concurrently. Command lines and
+    compiler output are printed in source order.
+
+    If graph is given, it is updated with the dependencies of all sources
+    and saved.
+    """
+    stems = [src.stem for src in srcs]
+    duplicates = sorted(set(stem for stem in stems if stems.count(stem) > 1))
+    if duplicates:
+        raise Exception(f"Multiple source files would compile to the same object: {', '.join(duplicates)}")
+
+    if object_cache_dir:
+        object_cache_dir.mkdir(parents=True, exist_ok=True)
+
+    objects = []
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = [pool.submit(compile_object, cwd, Path(src), cc_flags, toolchain, object_cache_dir, graph) for src in srcs]
+        for src, future in zip(srcs, futures):
+            try:
+                obj, cc_cmdline, output = future.result()
+            except subprocess.CalledProcessError as e:
+                print("\t", shlex.join(e.cmd))
+                sys.stdout.write(e.output)
+                raise
+            if cc_cmdline:
+                print("\t", shlex.join(cc_cmdline))
+            sys.stdout.write(output)
+            objects.append(obj)
+    num_cached = sum(obj.cached for obj in objects)
+    print(f"Compiled {len(objects) - num_cached} objects, {num_cached} taken from object cache.")
+    if graph and graph.filename:
+        graph.save()
+    return objects
+
+def update_archive(cwd, objects: list[CompiledObject], output_a_filename: Path, toolchain: Toolchain, cache_dir: Path=None):
+    """
+    Creates static library output_a_filename from objects.
+
+    With cache_dir, the archive of the previous run is kept in cache_dir and
+    only members whose object changed are replaced (or deleted if their
+    source is gone).
+    """
+    if not cache_dir or any(obj.key is None for obj in objects):
+        ar_cmdline = [toolchain.ar, "rcs", str(output_a_filename)] + [str(obj.path) for obj in objects]
+        print(shlex.join(ar_cmdline))
+        check_call(ar_cmdline, cwd)
+        return
+
+    cached_a = cache_dir / output_a_filename.name
+    members_fn = cache_dir / f"{output_a_filename.name}.members.json"
+    members = {obj.path.name: obj.key for obj in objects}
+    prev_members = Manifest.load(members_fn) if cached_a.exists() else None
+    prev_members = prev_members.entries if prev_members else {}
+
+    removed = sorted(name for name in prev_members if name not in members)
+    changed = [obj for obj in objects if prev_members.get(obj.path.name) != obj.key]
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if removed:
+        ar_cmdline = [toolchain.ar, "ds", str(cached_a)] + removed
+        print(shlex.join(ar_cmdline))
+        check_call(ar_cmdline, cwd)
+    if changed:
+        ar_cmdline = [toolchain.ar, "rcs", str(cached_a)] + [str(obj.path) for obj in changed]
+        print(shlex.join(ar_cmdline))
+        check_call(ar_cmdline, cwd)
+    if not (removed or changed):
+        print(f"Static lib is up to date, {len(objects)} members unchanged.")
+    Manifest(members).save(members_fn)
+    shutil.copyfile(cached_a, output_a_filename)
+
 def build_static_lib(cwd, srcs: list[Path], output_a_filename:Path,
-    arch: str=cfg_arch, abi: str=cfg_abi, include_system: list[Path]=[], include_quote: list[Path]=[]):
+    arch: str=cfg_arch, abi: str=cfg_abi, include_system: list[Path]=[], include_quote: list[Path]=[],
+    object_cache_dir: Path=None, cache_dir: Path=None, toolchain_cache: Path=None):
+    """
+    Args:
+        object_cache_dir: Content-addressed object cache (see compile_object).
+        toolchain_cache: Toolchain probe cache file (see probe_toolchain).
+        cache_dir: Directory for keeping the archive between runs, so that
+            only changed members are re-archived (see update_archive), and
+            the dependency graph of the objects (see compile_object).
+    """
     
-    prefix, zicsr_compat = find_toolchain_prefix()
-    if not zicsr_compat and arch.endswith('_zicsr'):
-        arch = arch.rsplit('_', 1)[0]
+    toolchain = probe_toolchain(toolchain_cache)
+    arch = toolchain.adapt_arch(arch)
 
-    cc_cmdline = [f"{prefix}gcc", "-c"] 
-    cc_cmdline += list(map(str, srcs)) 
+    cc_flags = []
     for path in include_system:
-        cc_cmdline += ["-isystem", str(path)]
+        cc_flags += ["-isystem", str(path)]
     for path in include_quote:
-        cc_cmdline += ["-iquote", str(path)]
-    cc_cmdline += get_cflags(abi, arch, funciton_sections=False)
-    print("Building static lib:\n\t", shlex.join(cc_cmdline))
-    subprocess.check_call(cc_cmdline, cwd=cwd)
-    object_files = list(cwd.glob("*.o"))
-    ar_cmdline = ["ar", "rcs", str(output_a_filename)] + list(map(str, object_files))
-    print(shlex.join(ar_cmdline))
-    subprocess.check_call(ar_cmdline, cwd=cwd)
+        cc_flags += ["-iquote", str(path)]
+    cc_flags += get_cflags(abi, arch, funciton_sections=False)
+    print("Building static lib:")
+    graph = DependencyGraph(cache_dir / "deps.json") if cache_dir else None
+    objects = compile_objects(cwd, srcs, cc_flags, toolchain, object_cache_dir, graph=graph)
+    update_archive(cwd, objects, output_a_filename, toolchain, cache_dir)
 
 
 def build_sw(cwd, srcs: list[Path], ldscript: Path,
     output_elf_filename:Path, output_disasm_filename:Path=None, output_mem_filename:Path=None,
-    arch: str=cfg_arch, abi: str=cfg_abi, include_system: list[Path]=[], include_quote: list[Path]=[], static_libs: list[Path]=[]):
+    arch: str=cfg_arch, abi: str=cfg_abi, include_system: list[Path]=[], include_quote: list[Path]=[], static_libs: list[Path]=[],
+    cache_dir: Path=None, object_cache_dir: Path=None, toolchain_cache: Path=None, jobs: int=None):
+    """
+    Compiles each source to an object file, then links them with the static
+    libraries.
+
+    Args:
+        cache_dir: If set, the outputs are stored in cache_dir together with
+            a manifest of all inputs (sources, headers they included in the
+            previous build, linker script, static libraries, toolchain
+            version and command line). When the inputs match the manifest of
+            the previous build, the outputs are copied from cache_dir instead
+            of being rebuilt. The dependency graph of the objects (see
+            compile_object) is kept in cache_dir as well.
+        object_cache_dir: Content-addressed object cache (see
+            compile_object), can be shared by all programs and libraries.
+        toolchain_cache: Toolchain probe cache file (see probe_toolchain).
+        jobs: Maximum number of concurrent compiler processes.
+
+    Returns:
+        True if the software was built, False if the outputs were taken
+        from cache_dir.
+    """
     
-    prefix, zicsr_compat = find_toolchain_prefix()
-    if not zicsr_compat and arch.endswith('_zicsr'):
-        arch = arch.rsplit('_', 1)[0]
+    toolchain = probe_toolchain(toolchain_cache)
+    arch = toolchain.adapt_arch(arch)
 
     #libs = ["-lgcc"]
     libs=[]
 
-    cc_cmdline = [f"{prefix}gcc"]
-    cc_cmdline += ["-T", str(ldscript)]
-    cc_cmdline += ["-o", str(output_elf_filename)] 
-    cc_cmdline += list(map(str, srcs)) 
+    cc_flags = []
     for path in include_system:
-        cc_cmdline += ["-isystem", str(path)]
+        cc_flags += ["-isystem", str(path)]
     for path in include_quote:
-        cc_cmdline += ["-iquote", str(path)]
-    cc_cmdline += get_cflags(abi, arch)
-    cc_cmdline += libs
+        cc_flags += ["-iquote", str(path)]
+    cc_flags += get_cflags(abi, arch)
+
+    objects_dir = cwd / "obj"
+    objects_dir.mkdir(exist_ok=True)
+
+    ld_cmdline = [toolchain.gcc]
+    ld_cmdline += ["-T", str(ldscript)]
+    ld_cmdline += ["-o", str(output_elf_filename)]
+    ld_cmdline += [str(objects_dir / f"{Path(src).stem}.o") for src in srcs]
+    ld_cmdline += get_cflags(abi, arch)
+    ld_cmdline += libs
     for l in static_libs:
-        cc_cmdline += [str(l)]
-    print("Building sw:\n\t", shlex.join(cc_cmdline))
-    subprocess.check_call(cc_cmdline, cwd=cwd)
+        ld_cmdline += [str(l)]
+
+    outputs = [output_elf_filename]
+    if output_disasm_filename:
+        outputs.append(output_disasm_filename)
+    if output_mem_filename:
+        outputs.append(output_mem_filename)
+
+    def make_manifest(graph):
+        headers = graph.deps(srcs)
+        if headers is None:
+            headers = find_headers(include_system + include_quote)
+        manifest = Manifest()
+        manifest.add_files(srcs)
+        manifest.add_file(ldscript)
+        manifest.add_files(static_libs)
+        for header in headers:
+            # Recorded headers may have been deleted since; as missing
+            # files (digest None), they count as changed inputs.
+            manifest.add_digest(header, graph.digest(header))
+        manifest.add_value("toolchain", toolchain.version)
+        manifest.add_value("cmdline", cc_flags + ld_cmdline)
+        return manifest
+
+    graph = DependencyGraph(cache_dir / "deps.json") if cache_dir else None
+    if cache_dir:
+        manifest = make_manifest(graph)
+        manifest_fn = cache_dir / "manifest.json"
+        prev_manifest = Manifest.load(manifest_fn)
+        if manifest == prev_manifest and restore_outputs(cache_dir, outputs):
+            print("Software is up to date, using outputs of previous build.")
+            return False
+        if prev_manifest is None:
+            print("Building sw: no previous build found.")
+        else:
+            print("Building sw: inputs changed since previous build:")
+            for key in manifest.diff(prev_manifest):
+                print(f"\t{key}")
+
+    print("Building sw:")
+    compile_objects(objects_dir, srcs, cc_flags, toolchain, object_cache_dir, jobs, graph)
+    print("Linking sw:\n\t", shlex.join(ld_cmdline))
+    check_call(ld_cmdline, cwd)
 
     # Separate size call is not required anymore, as it is now included in elf2mem:
     #print("Output size:")
     #subprocess.check_call([f"{prefix}size", "--format=gnu", str(output_elf_filename)])
 
     if output_disasm_filename:
-        disassemble(output_elf_filename, output_disasm_filename, cwd, prefix)
+        disassemble(output_elf_filename, output_disasm_filename, cwd, toolchain.prefix)
 
     if output_mem_filename:
-        #objcopy_to_verilog_mem(output_elf_filename, output_mem_filename, cwd, prefix)
+        #objcopy_to_verilog_mem(output_elf_filename, output_mem_filename, cwd, toolchain.prefix)
         elf2mem(output_elf_filename, output_mem_filename)
 
+    if cache_dir:
+        store_outputs(cache_dir, outputs)
+        # Recorded with the dependencies of this build, which may differ
+        # from those of the previous build used above:
+        make_manifest(graph).save(manifest_fn)
+    return True
+
 def objcopy_to_verilog_mem(input_elf_filename, output_mem_filename, cwd, prefix):
     subprocess.check_call([
         f"{prefix}objcopy",
@@ -0,0 +1,275 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+import fcntl
+import filecmp
+import hashlib
+import json
+import os
+import re
+import shutil
+import stat
+from contextlib import contextmanager
+from pathlib import Path
+
+def cache_root(cwd: Path) -> Path:
+    """
+    Returns the persistent cache directory of the build directory that cwd
+    belongs to.
+
+    pydesignflow removes a task's directory (cwd = <build_dir>/<block>/<task>)
+    before running the task, so anything that should survive between runs
+    is kept in <build_dir>/.cache instead.
+    """
+    return cwd.parents[1] / ".cache"
+
+def user_cache_dir() -> Path:
+    """
+    Returns the cache directory shared by all build directories of the
+    user: $RVLAB_CACHE_DIR if set, else rvlab/ in $XDG_CACHE_HOME or
+    ~/.cache.
+
+    To share the cache between users, set $RVLAB_CACHE_DIR to a
+    group-writable directory of a common group (with the setgid bit set, so
+    that new files belong to the group). Directories created in it are made
+    group-writable as well (see make_dirs).
+    """
+    if 'RVLAB_CACHE_DIR' in os.environ:
+        return Path(os.environ['RVLAB_CACHE_DIR'])
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / ".cache"
+    return Path(xdg_cache_home) / "rvlab"
+
+def make_dirs(path: Path):
+    """
+    Creates directory path and its missing parents. Directories created in
+    a group-writable directory are made group-writable too, so that the
+    users of a shared cache can all add entries and lock files.
+    """
+    if path.is_dir():
+        return
+    make_dirs(path.parent)
+    try:
+        path.mkdir()
+    except FileExistsError:
+        return
+    if path.parent.stat().st_mode & stat.S_IWGRP:
+        path.chmod(path.stat().st_mode | stat.S_IRWXG)
+
+@contextmanager
+def file_lock(filename: Path):
+    """
+    Holds an exclusive lock on filename (created if missing) for the
+    duration of the with block, waiting for other holders to release it.
+
+    The lock file is opened read-only, so that users sharing the cache can
+    lock files created by others.
+    """
+    make_dirs(filename.parent)
+    fd = os.open(filename, os.O_RDONLY | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+def populate_once(entry_dir: Path, populate) -> bool:
+    """
+    Creates the shared cache entry entry_dir by calling populate(tmp_dir)
+    unless it exists already. Returns True if it was populated by this call.
+
+    The entry is populated in a temporary directory next to it, which is
+    renamed to entry_dir once populate returned, so entry_dir is either
+    absent or complete. Concurrent callers (other builds, other users
+    sharing the cache) serialize on a lock file: whoever gets the lock
+    first populates the entry, the others wait and then use it.
+    """
+    if entry_dir.exists():
+        return False
+    with file_lock(entry_dir.with_name(f"{entry_dir.name}.lock")):
+        if entry_dir.exists():
+            return False
+        tmp = entry_dir.with_name(f"{entry_dir.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        try:
+            populate(tmp)
+            os.rename(tmp, entry_dir)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    return True
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+class Manifest:
+    """
+    Records the digest of every input of a build step.
+
+    Two manifests compare equal if all inputs are unchanged; diff() lists the
+    inputs that differ, for reporting why a rebuild happened.
+    """
+
+    def __init__(self, entries: dict[str, str]=None):
+        self.entries = dict(entries) if entries else {}
+
+    def add_file(self, path: Path):
+        self.add_digest(path, file_digest(path))
+
+    def add_digest(self, path: Path, digest: str):
+        """Adds path with a precomputed digest (None for a missing file)."""
+        self.entries[f"file:{path}"] = digest
+
+    def add_files(self, paths: list[Path]):
+        for path in paths:
+            self.add_file(path)
+
+    def add_value(self, key: str, value):
+        digest = hashlib.sha256(json.dumps(value, default=str).encode()).hexdigest()
+        self.entries[key] = digest
+
+    def digest(self) -> str:
+        return hashlib.sha256(json.dumps(self.entries, sort_keys=True).encode()).hexdigest()
+
+    def diff(self, other: 'Manifest') -> list[str]:
+        """Returns sorted list of keys that were added, removed or changed."""
+        keys = set(self.entries) | set(other.entries)
+        return sorted(k for k in keys if self.entries.get(k) != other.entries.get(k))
+
+    def __eq__(self, other):
+        return isinstance(other, Manifest) and self.entries == other.entries
+
+    def save(self, filename: Path):
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        with open(filename, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, filename: Path) -> 'Manifest':
+        """Returns the saved manifest or None if there is none."""
+        try:
+            with open(filename) as f:
+                return cls(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+def restore_outputs(cache_dir: Path, outputs: list[Path]) -> bool:
+    """
+    Copies cached outputs (stored under their file names in cache_dir) to
+    their destinations. Returns False without copying anything if an
+    output is missing from the cache.
+
+    Modification times are preserved, so restored outputs keep the mtime
+    of the build that produced them.
+    """
+    if not all((cache_dir / out.name).exists() for out in outputs):
+        return False
+    for out in outputs:
+        shutil.copy2(cache_dir / out.name, out)
+    return True
+
+def store_outputs(cache_dir: Path, outputs: list[Path]):
+    """
+    Copies outputs to cache_dir. Outputs that are identical to the cached
+    ones are given the modification time of the cached file instead, so
+    that a rebuild with identical results does not look like a change.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for out in outputs:
+        cached = cache_dir / out.name
+        if cached.exists() and filecmp.cmp(out, cached, shallow=False):
+            shutil.copystat(cached, out)
+        else:
+            shutil.copy2(out, cached)
+
+def parse_depfile(filename: Path, cwd: Path) -> list[Path]:
+    """
+    Returns the prerequisites listed in a make-style dependency file as
+    written by gcc -MD. Relative paths are taken relative to cwd.
+    """
+    with open(filename) as f:
+        text = f.read().replace('\\\n', ' ')
+    deps = []
+    for line in text.splitlines():
+        _, sep, prereqs = line.partition(':')
+        if not sep:
+            continue
+        for token in re.split(r'(?<!\\)\s+', prereqs.strip()):
+            if token:
+                deps.append(cwd / token.replace('\\ ', ' '))
+    return deps
+
+class DependencyGraph:
+    """
+    Persistent record of the files (source and headers) each object was
+    compiled from, together with their digests and the resulting object
+    cache key.
+
+    An object whose source, flags and dependencies are all unchanged can be
+    taken from the object cache without running the preprocessor; after a
+    header edit, exactly the objects that include the header are rebuilt.
+    """
+
+    def __init__(self, filename: Path=None):
+        self.filename = filename
+        self.entries = {}
+        self.digests = {}
+        if filename:
+            try:
+                with open(filename) as f:
+                    self.entries = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+
+    def digest(self, path: Path) -> str:
+        """Returns file digest, memoized for the lifetime of the graph."""
+        path = str(path)
+        if path not in self.digests:
+            try:
+                self.digests[path] = file_digest(path)
+            except FileNotFoundError:
+                self.digests[path] = None
+        return self.digests[path]
+
+    def lookup(self, src: Path, flags: str) -> str:
+        """
+        Returns the recorded object key of src if it was compiled with the
+        same flags and none of its dependencies changed, else None.
+        """
+        entry = self.entries.get(str(src))
+        if not entry or entry['flags'] != flags:
+            return None
+        for dep, digest in entry['deps'].items():
+            if self.digest(dep) != digest:
+                return None
+        return entry['key']
+
+    def record(self, src: Path, flags: str, deps: list[Path], key: str):
+        self.entries[str(src)] = {
+            'flags': flags,
+            'deps': {str(dep): self.digest(dep) for dep in deps},
+            'key': key,
+        }
+
+    def deps(self, srcs: list[Path]) -> list[Path]:
+        """
+        Returns the union of the recorded dependencies of srcs, or None if
+        any of srcs has not been recorded yet.
+        """
+        deps = set()
+        for src in srcs:
+            entry = self.entries.get(str(src))
+            if not entry:
+                return None
+            deps.update(entry['deps'])
+        return [Path(dep) for dep in sorted(deps)]
+
+    def save(self):
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.filename.with_name(f"{self.filename.name}.{os.getpid()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.filename)
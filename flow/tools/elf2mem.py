@@ -4,10 +4,12 @@
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
 import sys
-from elftools.elf.elffile import ELFFile
-from elftools.elf.constants import SH_FLAGS
+import struct
+from collections import namedtuple
 
 def load_elf_to_mem(mem, filename_in, verbose=False):
+    from elftools.elf.elffile import ELFFile
+    from elftools.elf.constants import SH_FLAGS
     max_addr = 0
     with open(filename_in, 'rb') as f:
         elffile = ELFFile(f)
@@ -27,24 +29,56 @@ def load_elf_to_mem(mem, filename_in, verbose=False):
 
     return max_addr
 
-def dump_mem_to_file(mem, filename_out, bytes_per_line):
-    cur_addr = 0
-    with open(filename_out, "w") as f:
-        while True:
-            line_data = mem[cur_addr:cur_addr+bytes_per_line]
-            if len(line_data) == bytes_per_line:
-                f.write(bytes(reversed(line_data)).hex())
-                f.write("\n")
-            elif len(line_data) == 0:
-                break
+ElfSize = namedtuple('ElfSize', ['text', 'data', 'bss'])
+
+def elf_size(filename_in) -> ElfSize:
+    """
+    Returns the section sizes of an ELF file, grouped like the Berkeley
+    format of binutils' size: read-only allocated sections count as text,
+    writable ones as data and NOBITS sections as bss.
+    """
+    from elftools.elf.elffile import ELFFile
+    from elftools.elf.constants import SH_FLAGS
+    text, data, bss = 0, 0, 0
+    with open(filename_in, 'rb') as f:
+        elffile = ELFFile(f)
+        for section in elffile.iter_sections():
+            flags = section['sh_flags']
+            if not (flags & SH_FLAGS.SHF_ALLOC):
+                continue
+            if section['sh_type'] == 'SHT_NOBITS':
+                bss += section['sh_size']
+            elif flags & SH_FLAGS.SHF_WRITE:
+                data += section['sh_size']
             else:
-                raise Exception("Memory size seems not to be divisible by bytes_per_line.")
-            cur_addr += bytes_per_line
+                text += section['sh_size']
+    return ElfSize(text, data, bss)
 
-def elf2mem(filename_in, filename_out, verbose=True):
-    mem_size = 256*1024 # bytes
-    bytes_per_line = 4
+def swap_lines(mem, bytes_per_line):
+    """Returns a copy of mem with the byte order within each line reversed."""
+    if len(mem) % bytes_per_line != 0:
+        raise Exception("Memory size seems not to be divisible by bytes_per_line.")
+    src = memoryview(mem)
+    swapped = bytearray(len(mem))
+    # One strided copy per byte position instead of one slice per line:
+    for i in range(bytes_per_line):
+        swapped[i::bytes_per_line] = src[bytes_per_line-1-i::bytes_per_line]
+    return swapped
+
+def dump_mem_to_file(mem, filename_out, bytes_per_line):
+    swapped = swap_lines(mem, bytes_per_line)
+    with open(filename_out, "w") as f:
+        if len(swapped) > 0:
+            f.write(swapped.hex('\n', bytes_per_line))
+            f.write("\n")
 
+def elf2mem(filename_in, filename_out, verbose=True, mem_size=256*1024, bytes_per_line=4):
+    """
+    Args:
+        mem_size: Memory size in bytes
+        bytes_per_line: Memory word width in bytes (one word per line in
+            filename_out, most significant byte first)
+    """
     mem = bytearray(mem_size)
 
     if verbose:
@@ -54,9 +88,62 @@ def elf2mem(filename_in, filename_out, verbose=True):
     load_elf_to_mem(mem, filename_in, verbose)
     dump_mem_to_file(mem, filename_out, bytes_per_line)
 
-def elfdelta(elf_in, elf_ref_in, filename_out):
-    mem_size = 256*1024 # bytes
+DeltaSummary = namedtuple('DeltaSummary', ['words_sent', 'words_skipped', 'runs'])
+
+def find_changed_runs(mem, mem_ref, end, page_size=4096, word_size=4):
+    """
+    Returns list of (start, stop) address ranges of words that differ
+    between mem and mem_ref within [0, end). Adjacent changed words are
+    coalesced into one range. Equal pages are skipped with one comparison.
+    """
+    view = memoryview(mem)
+    view_ref = memoryview(mem_ref)
+    runs = []
+    for page_start in range(0, end, page_size):
+        page_end = min(page_start + page_size, end)
+        if view[page_start:page_end] == view_ref[page_start:page_end]:
+            continue
+        for addr in range(page_start, page_end, word_size):
+            if view[addr:addr+word_size] == view_ref[addr:addr+word_size]:
+                continue
+            if runs and runs[-1][1] == addr:
+                runs[-1][1] = addr + word_size
+            else:
+                runs.append([addr, addr + word_size])
+    return runs
+
+DELTA_BIN_MAGIC = b'RVLD'
+
+def write_delta_text(f_out, mem, runs, bytes_per_line):
+    for start, stop in runs:
+        f_out.write(f'addr {start:08x}\n'.encode())
+        data = swap_lines(mem[start:stop], bytes_per_line)
+        f_out.write(('data ' + data.hex('\n', bytes_per_line).replace('\n', '\ndata ') + '\n').encode())
+
+def write_delta_bin(f_out, mem, runs, bytes_per_line):
+    f_out.write(DELTA_BIN_MAGIC)
+    for start, stop in runs:
+        f_out.write(struct.pack('>II', start, (stop - start) // bytes_per_line))
+        f_out.write(swap_lines(mem[start:stop], bytes_per_line))
+
+def elfdelta(elf_in, elf_ref_in, filename_out, mem_size=256*1024, fmt='text', verbose=True):
+    """
+    Writes the words in which elf_in differs from elf_ref_in to filename_out
+    for loading via tu.dm_load_delta (src/tb/rvlab_test_utils.sv).
+
+    Formats:
+        text: Lines "addr <hex>" start a run of consecutive words,
+            each following line "data <hex>" holds one word.
+        bin: Magic "RVLD", then per run: start address, number of words and
+            the words themselves, all as big-endian 32-bit values.
+
+    Args:
+        fmt: 'text' or 'bin'
+    """
     bytes_per_line = 4
+    writers = {'text': write_delta_text, 'bin': write_delta_bin}
+    if fmt not in writers:
+        raise ValueError(f"Unknown delta format '{fmt}'")
 
     mem = bytearray(mem_size)
     mem_ref = bytearray(mem_size)
@@ -64,18 +151,16 @@ def elfdelta(elf_in, elf_ref_in, filename_out):
     # it is not overwritten with zeros (to save some time).
     max_addr = load_elf_to_mem(mem, elf_in)
     load_elf_to_mem(mem_ref, elf_ref_in)
-    send_addr = True
-    with open(filename_out, 'w') as f_out:
-        for addr in range(0, max_addr, bytes_per_line):
-            data = mem[addr:addr+4]
-            data_ref = mem_ref[addr:addr+4]
-            if data == data_ref:
-                send_addr=True
-            else:
-                if send_addr:
-                    f_out.write(f'addr {addr:08x}\n')
-                f_out.write(f'data {bytes(reversed(data)).hex()}\n')
-                send_addr=False
+    end = (max_addr + bytes_per_line - 1) & ~(bytes_per_line - 1)
+    runs = find_changed_runs(mem, mem_ref, end, word_size=bytes_per_line)
+    with open(filename_out, 'wb') as f_out:
+        writers[fmt](f_out, mem, runs, bytes_per_line)
+
+    words_sent = sum(stop - start for start, stop in runs) // bytes_per_line
+    summary = DeltaSummary(words_sent, end // bytes_per_line - words_sent, len(runs))
+    if verbose:
+        print(f"Delta: {summary.words_sent} words sent in {summary.runs} runs, {summary.words_skipped} words skipped.")
+    return summary
 
 if __name__=="__main__":
     elf2mem(sys.argv[1], sys.argv[2])
@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+import logging
+import os
+import sys
+import traceback
+from collections import namedtuple
+
+GenOutcome = namedtuple('GenOutcome', ['log', 'error'])
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+def run_logged(func, *args) -> GenOutcome:
+    """
+    Runs func(*args) and returns the log messages it emitted and, if it
+    raised, the formatted exception.
+    """
+    handler = ListHandler()
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        func(*args)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        root.removeHandler(handler)
+    return GenOutcome(handler.lines, error)
+
+def run_generators(jobs: dict[str, tuple], processes: int=None):
+    """
+    Runs independent generator calls, one per input file.
+
+    Args:
+        jobs: Maps a label (e.g. input file name) to (func, args). func must
+            be picklable, i.e. a module-level function.
+        processes: Number of worker processes. Defaults to one per job, up
+            to the CPU count. With 1, the jobs are run in this process.
+
+    Log messages (e.g. validation errors) of each job are printed below its
+    label once it finished, in the order of jobs. If any job failed, an
+    Exception naming the failed labels is raised after all jobs finished.
+    """
+    if not jobs:
+        return
+    processes = processes or min(len(jobs), os.cpu_count() or 1)
+    if processes == 1:
+        outcomes = [run_logged(func, *args) for func, args in jobs.values()]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [pool.submit(run_logged, func, *args) for func, args in jobs.values()]
+            outcomes = [future.result() for future in futures]
+
+    failed = []
+    for label, outcome in zip(jobs, outcomes):
+        if not (outcome.log or outcome.error):
+            continue
+        print(f"{label}:", file=sys.stderr)
+        for line in outcome.log:
+            print(f"  {line}", file=sys.stderr)
+        if outcome.error:
+            print(outcome.error, file=sys.stderr)
+            failed.append(label)
+    if failed:
+        raise Exception(f"Generation failed for: {', '.join(failed)}")
@@ -1,13 +1,15 @@
 # SPDX-License-Identifier: Apache-2.0
 # SPDX-FileCopyrightText: 2025 RVLab Contributors
 
+import asyncio
+import os
 import socket
 import sys
 import subprocess
 import time
 import tty
 import termios
-import select
+import struct
 from contextlib import contextmanager
 
 class Hostio:
@@ -23,12 +25,75 @@ class Hostio:
     IBUF_WIDX = 0x0003F810
     IBUF_RIDX = 0x0003F814
 
+def parse_words(raw: str, count: int) -> list[int]:
+    """Parses the reply of a 32-bit read_memory command."""
+    ret = [int(x, 0) for x in raw.split()]
+    if len(ret) != count:
+        raise Exception(f"read_memory returned {len(ret)} words, expected {count}.")
+    return ret
+
+class Reply:
+    """Placeholder for the reply of a queued command, set by CommandBatch.flush."""
+    def __init__(self, convert):
+        self.convert = convert
+        self.value = None
+
+class CommandBatch:
+    """Commands queued by OpenOcd.batch."""
+    def __init__(self):
+        self.queue = []
+
+    def cmd(self, cmd: str, convert=lambda raw: raw) -> Reply:
+        reply = Reply(convert)
+        self.queue.append((cmd, reply))
+        return reply
+
+    def readword(self, address) -> Reply:
+        return self.cmd(f"read_memory 0x{address:08x} 32 1", lambda raw: int(raw, 0))
+
+    def readwords(self, address, count) -> Reply:
+        return self.cmd(f"read_memory 0x{address:08x} 32 {count}",
+            lambda raw: parse_words(raw, count))
+
+    def readbytes(self, address, length) -> Reply:
+        """Reads length bytes starting at address using a word-aligned block read."""
+        waddr_start = address & ~3
+        waddr_end = (address + length + 3) & ~3
+        count = (waddr_end - waddr_start) // 4
+        offset = address - waddr_start
+        def convert(raw):
+            data = struct.pack(f"<{count}I", *parse_words(raw, count))
+            return data[offset:offset+length]
+        return self.cmd(f"read_memory 0x{waddr_start:08x} 32 {count}", convert)
+
+    def writeword(self, address, value) -> Reply:
+        return self.cmd(f"write_memory 0x{address:08x} 32 0x{value:08x}")
+
+    def writewords(self, address, values) -> Reply:
+        """Writes consecutive 32-bit words with a single TCL command."""
+        values_str = " ".join(f"0x{v:08x}" for v in values)
+        return self.cmd(f"write_memory 0x{address:08x} 32 {{{values_str}}}")
+
+    def resolve(self, raws):
+        for (_, reply), raw in zip(self.queue, raws):
+            reply.value = reply.convert(raw)
+        self.queue = []
+
+    def flush(self, ocd):
+        if len(self.queue) > 0:
+            self.resolve(ocd.cmds([cmd for cmd, _ in self.queue]))
+
+    async def flush_async(self, ocd):
+        if len(self.queue) > 0:
+            self.resolve(await ocd.cmds_async([cmd for cmd, _ in self.queue]))
+
 class OpenOcd:
     def __init__(self, remote_host="127.0.0.1", remote_port=6666, verbose=False):
         self.remote_host = remote_host
         self.remote_port = remote_port
         self.verbose = verbose
         self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.rxbuf = bytes()
 
     def __enter__(self):
         self.conn.connect((self.remote_host, self.remote_port))
@@ -41,21 +106,73 @@ class OpenOcd:
             self.conn.close()
 
     def cmd(self, cmd: str) -> str:
-        data = cmd.encode("utf-8") + b'\x1A'
+        return self.cmds([cmd])[0]
+
+    def encode_cmds(self, cmds: list[str]) -> bytes:
+        data = b''.join(cmd.encode("utf-8") + b'\x1A' for cmd in cmds)
         if self.verbose:
             print(f"[send] {data!r}")
-        self.conn.send(data)
-
-        # Read response message ending with 0x1A:
-        data = bytes()
-        while len(data) == 0 or data[-1] != 0x1A:
-            data += self.conn.recv(4096)
-        data = data[:-1].decode("utf-8").strip()
+        return data
 
+    def pop_reply(self) -> str:
+        """Returns the first complete reply in the receive buffer or None."""
+        end = self.rxbuf.find(b'\x1A')
+        if end < 0:
+            return None
+        reply = self.rxbuf[:end].decode("utf-8").strip()
+        self.rxbuf = self.rxbuf[end+1:]
         if self.verbose:
-            print(f"[recv] {data!r}")
+            print(f"[recv] {reply!r}")
+        return reply
 
-        return data
+    def append_rxbuf(self, chunk: bytes):
+        if len(chunk) == 0:
+            raise ConnectionError("OpenOCD closed the connection.")
+        self.rxbuf += chunk
+
+    def cmds(self, cmds: list[str]) -> list[str]:
+        """
+        Sends multiple commands in one write and returns their replies.
+
+        OpenOCD processes the commands in order and terminates each reply
+        with 0x1A, so all replies can be collected after a single round-trip.
+        """
+        self.conn.sendall(self.encode_cmds(cmds))
+        replies = []
+        for _ in cmds:
+            # Read response message ending with 0x1A:
+            while (reply := self.pop_reply()) is None:
+                self.append_rxbuf(self.conn.recv(4096))
+            replies.append(reply)
+        return replies
+
+    async def cmds_async(self, cmds: list[str]) -> list[str]:
+        """Same as cmds, for use in an asyncio event loop (see HostioConsole)."""
+        loop = asyncio.get_running_loop()
+        await loop.sock_sendall(self.conn, self.encode_cmds(cmds))
+        replies = []
+        for _ in cmds:
+            while (reply := self.pop_reply()) is None:
+                self.append_rxbuf(await loop.sock_recv(self.conn, 4096))
+            replies.append(reply)
+        return replies
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager for queueing commands that are sent together when
+        the context is left.
+
+        Example::
+
+            with ocd.batch() as b:
+                flags = b.readword(Hostio.FLAGS)
+                widx = b.readword(Hostio.OBUF_WIDX)
+            print(flags.value, widx.value)
+        """
+        b = CommandBatch()
+        yield b
+        b.flush(self)
 
     def load_image(self, filename):
         self.cmd(f"load_image {filename} 0 elf")
@@ -68,6 +185,20 @@ class OpenOcd:
         ret = int(raw, 0)
         return ret
 
+    def readwords(self, address, count):
+        """Reads count consecutive 32-bit words with a single TCL command."""
+        with self.batch() as b:
+            reply = b.readwords(address, count)
+        return reply.value
+
+    def readbytes(self, address, length):
+        """Reads length bytes starting at address using a word-aligned block read."""
+        if length == 0:
+            return b''
+        with self.batch() as b:
+            reply = b.readbytes(address, length)
+        return reply.value
+
     def writeword(self, address, value):
         self.cmd(f"write_memory 0x{address:08x} 32 0x{value:08x}")
 
@@ -80,52 +211,150 @@ class OpenOcd:
         self.writeword(waddr, word)
 
     def hostio_clear(self):
-        self.writeword(Hostio.FLAGS, 0)
-        self.writeword(Hostio.RETVAL, 0)
-        self.writeword(Hostio.OBUF_WIDX, 0)
-        self.writeword(Hostio.OBUF_RIDX, 0)
-        self.writeword(Hostio.IBUF_WIDX, 0)
-        self.writeword(Hostio.IBUF_RIDX, 0)
+        with self.batch() as b:
+            b.writeword(Hostio.FLAGS, 0)
+            b.writeword(Hostio.RETVAL, 0)
+            b.writeword(Hostio.OBUF_WIDX, 0)
+            b.writeword(Hostio.OBUF_RIDX, 0)
+            b.writeword(Hostio.IBUF_WIDX, 0)
+            b.writeword(Hostio.IBUF_RIDX, 0)
         self.obuf_ridx = 0
         self.ibuf_widx = 0
+        # Copy of what was written to IBUF, used to merge partial words:
+        self.ibuf_shadow = bytearray(Hostio.IBUF_SIZE)
+        self.obuf_bytes = 0
+        self.obuf_time = 0.0
 
-    def hostio_read(self):
-        widx = self.readword(Hostio.OBUF_WIDX)
-
-        wordaddr_last = -1
-        while widx != self.obuf_ridx:
-            wordaddr = Hostio.OBUF + (self.obuf_ridx&~3)
-            if wordaddr != wordaddr_last:
-                word = self.readword(wordaddr)
-                wordaddr_last = wordaddr
-            char = chr(word >> ((self.obuf_ridx&3)*8) & 0xff)
-            if char == '\n':
-                sys.stdout.write('\r\n')
-            else:
-                sys.stdout.write(char)
-            sys.stdout.flush()
-            self.obuf_ridx = (self.obuf_ridx + 1) & (Hostio.OBUF_SIZE-1)
-        
-        self.writeword(Hostio.OBUF_RIDX, self.obuf_ridx)
+    def hostio_queue_read(self, b: CommandBatch, widx: int) -> list[Reply]:
+        """
+        Queues reading the pending span between OBUF_RIDX and OBUF_WIDX,
+        followed by the update of OBUF_RIDX.
+
+        The span is fetched with at most two block reads (two only when it
+        wraps around the end of the ring buffer).
+
+        Returns:
+            Replies whose concatenated values are the pending bytes.
+        """
+        ridx = self.obuf_ridx
+        if widx == ridx:
+            return []
+        if widx > ridx:
+            replies = [b.readbytes(Hostio.OBUF + ridx, widx - ridx)]
+        else:
+            replies = [b.readbytes(Hostio.OBUF + ridx, Hostio.OBUF_SIZE - ridx)]
+            if widx > 0:
+                replies.append(b.readbytes(Hostio.OBUF, widx))
+        b.writeword(Hostio.OBUF_RIDX, widx)
+        self.obuf_ridx = widx
+        return replies
+
+    def hostio_account(self, data: bytes, time_started: float) -> bytes:
+        self.obuf_bytes += len(data)
+        self.obuf_time += time.monotonic() - time_started
+        return data
+
+    def hostio_read(self, widx=None) -> bytes:
+        """
+        Reads pending output from the OBUF ring buffer.
+
+        Args:
+            widx: Value of OBUF_WIDX if already known (e.g. from a batched
+                poll), otherwise it is read from the target.
+
+        Returns:
+            Bytes read.
+        """
+        if widx is None:
+            widx = self.readword(Hostio.OBUF_WIDX)
+        time_started = time.monotonic()
+        with self.batch() as b:
+            replies = self.hostio_queue_read(b, widx)
+        return self.hostio_account(b''.join(r.value for r in replies), time_started)
+
+    async def hostio_read_async(self, widx: int) -> bytes:
+        """Same as hostio_read, for use in an asyncio event loop."""
+        time_started = time.monotonic()
+        b = CommandBatch()
+        replies = self.hostio_queue_read(b, widx)
+        await b.flush_async(self)
+        return self.hostio_account(b''.join(r.value for r in replies), time_started)
+
+    def hostio_queue_write(self, b: CommandBatch, data: bytes, ridx: int) -> int:
+        """
+        Queues writing as much of data to the IBUF ring buffer as free space
+        permits, followed by a single update of IBUF_WIDX.
+
+        The data is packed into aligned words and written with one block
+        write per contiguous span (two if it wraps around the end of the ring
+        buffer). Partial words at the span boundaries are merged with
+        previously written input from ibuf_shadow, which is valid because the
+        debug host is the only writer of IBUF.
+
+        Args:
+            ridx: Current value of IBUF_RIDX.
+
+        Returns:
+            Number of bytes queued.
+        """
+        free = (ridx - self.ibuf_widx - 1) & (Hostio.IBUF_SIZE - 1)
+        data = data[:free]
+        widx = self.ibuf_widx
+        pos = 0
+        while pos < len(data):
+            span = min(len(data) - pos, Hostio.IBUF_SIZE - widx)
+            self.ibuf_shadow[widx:widx+span] = data[pos:pos+span]
+            waddr_start = widx & ~3
+            waddr_end = (widx + span + 3) & ~3
+            count = (waddr_end - waddr_start) // 4
+            words = struct.unpack(f"<{count}I", self.ibuf_shadow[waddr_start:waddr_end])
+            b.writewords(Hostio.IBUF + waddr_start, words)
+            widx = (widx + span) & (Hostio.IBUF_SIZE - 1)
+            pos += span
+        if len(data) > 0:
+            b.writeword(Hostio.IBUF_WIDX, widx)
+            self.ibuf_widx = widx
+        return len(data)
 
     def hostio_write(self, data):
+        """
+        Writes data (str or bytes) to the IBUF ring buffer, waiting for the
+        program to free up space if necessary.
+        """
+        if isinstance(data, str):
+            data = data.encode('latin-1')
         ridx = self.readword(Hostio.IBUF_RIDX)
-        ibuf_enqueued = Hostio.IBUF_SIZE
-        for char in data:
-            while ibuf_enqueued >= Hostio.IBUF_SIZE:
-                ibuf_enqueued = (self.ibuf_widx - ridx) & (Hostio.IBUF_SIZE - 1)
+        while True:
+            with self.batch() as b:
+                written = self.hostio_queue_write(b, data, ridx)
+                ridx_reply = b.readword(Hostio.IBUF_RIDX)
+            data = data[written:]
+            if len(data) == 0:
+                break
+            if written == 0:
+                time.sleep(0.001)
+            ridx = ridx_reply.value
 
-            self.writebyte(Hostio.IBUF + self.ibuf_widx, ord(char))
-            self.ibuf_widx = (self.ibuf_widx + 1) & (Hostio.IBUF_SIZE-1)
-            self.writeword(Hostio.IBUF_WIDX, self.ibuf_widx)
+    async def hostio_write_async(self, data: bytes, ridx: int) -> int:
+        """
+        Writes as much of data to the IBUF ring buffer as free space permits.
 
+        Args:
+            ridx: Current value of IBUF_RIDX.
 
+        Returns:
+            Number of bytes written.
+        """
+        b = CommandBatch()
+        written = self.hostio_queue_write(b, data, ridx)
+        await b.flush_async(self)
+        return written
 
-    def run_prog(self, elf_filename):
+    def start_prog(self, elf_filename):
+        """Loads the program and starts it with cleared host I/O buffers."""
         self.cmd("halt")
         self.cmd("tcl_trace off")
-        flags = 0
-        self.hostio_clear()        
+        self.hostio_clear()
 
         print(f"Loading {elf_filename}...")
 
@@ -136,26 +365,155 @@ class OpenOcd:
 
         time.sleep(1)
 
-        old_settings = termios.tcgetattr(sys.stdin.fileno())
+    def run_prog(self, elf_filename):
+        self.start_prog(elf_filename)
+
+        console = HostioConsole(self)
+        retval = console.run_sync()
+        if retval is None:
+            retval = self.readword(Hostio.RETVAL)
+        print("Execution finished. Return value:", retval)
+        self.print_hostio_stats()
+
+    def print_hostio_stats(self):
+        if self.obuf_time > 0:
+            rate = self.obuf_bytes / self.obuf_time
+            print(f"Host I/O: received {self.obuf_bytes} bytes in {self.obuf_time:.3f} s ({rate:.0f} bytes/s).")
+
+class HostioConsole:
+    """
+    asyncio-based host I/O engine, connecting the program's stdin/stdout ring
+    buffers with the terminal (interactive) or with Python code (headless).
+
+    The target is polled adaptively: after output was received, the next
+    poll follows after poll_min (immediately if the ring buffer was at least
+    half full); while idle, the poll interval doubles up to poll_max.
+    Input wakes up the loop immediately.
+
+    Headless example::
+
+        ocd.start_prog(elf)
+        console = HostioConsole(ocd, interactive=False)
+        console.send(b"help\n")
+        retval = console.run_sync(timeout=10)
+        print(console.output.decode())
+    """
+
+    def __init__(self, ocd: OpenOcd, interactive: bool=True,
+            poll_min: float=0.001, poll_max: float=0.05):
+        """
+        Args:
+            ocd: Connected OpenOcd object. hostio_clear must have been called.
+            interactive: If True, stdin and stdout of the terminal are used
+                (raw mode, Ctrl+C / Ctrl+D exit). If False, output is
+                collected in .output and input is passed via send().
+            poll_min: Minimum interval (seconds) between polls.
+            poll_max: Maximum interval (seconds) between polls while idle.
+        """
+        self.ocd = ocd
+        self.interactive = interactive
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.output = bytearray()
+        self.input = bytearray()
+        self.input_event = None
+        self.stopped = False
+
+    def send(self, data: bytes):
+        """Queues data for the program's stdin."""
+        self.input += data
+        if self.input_event:
+            self.input_event.set()
+
+    def stop(self):
+        """Ends run() after the current poll."""
+        self.stopped = True
+        if self.input_event:
+            self.input_event.set()
+
+    def write_output(self, data: bytes):
+        if self.interactive:
+            sys.stdout.write(data.decode('latin-1').replace('\n', '\r\n'))
+            sys.stdout.flush()
+        else:
+            self.output += data
+
+    def read_stdin(self):
+        data = os.read(sys.stdin.fileno(), Hostio.IBUF_SIZE)
+        for i, c in enumerate(data):
+            if c in (0x03, 0x04): # Ctrl+C or Ctrl+D
+                self.send(data[:i])
+                self.stop()
+                return
+        self.send(data)
+
+    async def run(self, timeout: float=None) -> int:
+        """
+        Runs until the program exits, stop() is called or timeout (seconds)
+        elapses.
+
+        Returns:
+            Return value of the program or None if it did not exit.
+        """
+        loop = asyncio.get_running_loop()
+        self.input_event = asyncio.Event()
+        deadline = None if timeout is None else loop.time() + timeout
+        stdin_fd = sys.stdin.fileno() if self.interactive else None
+        if self.interactive:
+            old_settings = termios.tcgetattr(stdin_fd)
+            tty.setraw(stdin_fd)
+            loop.add_reader(stdin_fd, self.read_stdin)
+        self.ocd.conn.setblocking(False)
         try:
-            tty.setraw(sys.stdin.fileno())
-            while (flags & 1) == 0:
-                flags = self.readword(Hostio.FLAGS)
-
-                self.hostio_read()
-
-                rready, _, _ = select.select([sys.stdin], [], [], 0)
-                if len(rready) > 0:
-                    c = sys.stdin.read(1)
-                    #print(repr(c))
-                    if c in ('\x03', '\x04'): #Ctrl+C or Ctrl+D
-                        break
-                    self.hostio_write(c)
+            return await self.poll_loop(deadline)
         finally:
-            termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, old_settings)
+            self.ocd.conn.setblocking(True)
+            if self.interactive:
+                loop.remove_reader(stdin_fd)
+                termios.tcsetattr(stdin_fd, termios.TCSADRAIN, old_settings)
 
-        retval = self.readword(Hostio.RETVAL)
-        print("Execution finished. Return value:", retval)
+    async def poll_loop(self, deadline):
+        loop = asyncio.get_running_loop()
+        interval = self.poll_min
+        while not self.stopped:
+            self.input_event.clear()
+            b = CommandBatch()
+            flags = b.readword(Hostio.FLAGS)
+            widx = b.readword(Hostio.OBUF_WIDX)
+            ridx = b.readword(Hostio.IBUF_RIDX) if len(self.input) > 0 else None
+            await b.flush_async(self.ocd)
+
+            data = await self.ocd.hostio_read_async(widx.value)
+            self.write_output(data)
+
+            if flags.value & 1:
+                retval = b.readword(Hostio.RETVAL)
+                await b.flush_async(self.ocd)
+                return retval.value
+
+            if ridx is not None:
+                written = await self.ocd.hostio_write_async(bytes(self.input), ridx.value)
+                del self.input[:written]
+
+            if len(data) >= Hostio.OBUF_SIZE // 2:
+                interval = 0
+            elif len(data) > 0 or len(self.input) > 0:
+                interval = self.poll_min
+            else:
+                interval = min(max(interval, self.poll_min)*2, self.poll_max)
+
+            if deadline is not None and loop.time() >= deadline:
+                break
+
+            if interval > 0:
+                try:
+                    await asyncio.wait_for(self.input_event.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+        return None
+
+    def run_sync(self, timeout: float=None) -> int:
+        return asyncio.run(self.run(timeout))
 
 @contextmanager
 def start(openocd_cfg):
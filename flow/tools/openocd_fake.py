@@ -0,0 +1,160 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+"""
+Local stand-in for the OpenOCD TCL server, for testing the OpenOcd client
+and host I/O without FPGA hardware.
+
+Memory accesses (read_memory / write_memory) operate on a bytearray that
+mirrors the main BRAM. All other commands are accepted and answered with an
+empty reply. The program_* methods act as the firmware side of the host I/O
+ring buffers (see src/sw/sys/hostio.c).
+
+Example::
+
+    with FakeOpenOcdServer() as server:
+        with OpenOcd(remote_port=server.port) as ocd:
+            ocd.hostio_clear()
+            server.program_write(b"Hello\\n")
+            ocd.hostio_read()
+"""
+
+import socketserver
+import struct
+import sys
+import threading
+from .openocd import Hostio
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        fake = self.server.fake
+        rxbuf = bytes()
+        while True:
+            chunk = self.request.recv(4096)
+            if len(chunk) == 0:
+                return
+            rxbuf += chunk
+            *cmds, rxbuf = rxbuf.split(b'\x1A')
+            replies = [fake.execute(cmd.decode("utf-8")) for cmd in cmds]
+            self.request.sendall(b''.join(r.encode("utf-8") + b'\x1A' for r in replies))
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class FakeOpenOcdServer:
+    def __init__(self, host="127.0.0.1", port=0, mem_size=256*1024):
+        """
+        Args:
+            port: TCP port to listen on. The default 0 selects a free port,
+                which is available as .port after the server was started.
+            mem_size: Size of emulated memory in bytes.
+        """
+        self.memory = bytearray(mem_size)
+        self.lock = threading.Lock()
+        self.commands = []
+        self.server = _Server((host, port), _Handler)
+        self.server.fake = self
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    # TCL command emulation
+    # ---------------------
+
+    def execute(self, cmd: str) -> str:
+        with self.lock:
+            self.commands.append(cmd)
+            args = cmd.replace('{', ' ').replace('}', ' ').split()
+            if len(args) == 0:
+                return ""
+            if args[0] == "read_memory":
+                return self.read_memory(int(args[1], 0), int(args[2]), int(args[3]))
+            if args[0] == "write_memory":
+                return self.write_memory(int(args[1], 0), int(args[2]), [int(x, 0) for x in args[3:]])
+            return ""
+
+    def read_memory(self, address, width, count):
+        fmt = self.struct_format(width)
+        nbytes = width // 8
+        values = []
+        for i in range(count):
+            a = address + i*nbytes
+            values.append(struct.unpack(fmt, self.memory[a:a+nbytes])[0])
+        return " ".join(f"0x{v:0{nbytes*2}x}" for v in values)
+
+    def write_memory(self, address, width, values):
+        fmt = self.struct_format(width)
+        nbytes = width // 8
+        for i, v in enumerate(values):
+            a = address + i*nbytes
+            self.memory[a:a+nbytes] = struct.pack(fmt, v)
+        return ""
+
+    @staticmethod
+    def struct_format(width):
+        try:
+            return {8: '<B', 16: '<H', 32: '<I'}[width]
+        except KeyError:
+            raise ValueError(f"Unsupported memory access width {width}.")
+
+    # Firmware side of host I/O
+    # -------------------------
+
+    def word(self, address):
+        return struct.unpack('<I', self.memory[address:address+4])[0]
+
+    def set_word(self, address, value):
+        self.memory[address:address+4] = struct.pack('<I', value)
+
+    def program_write(self, data: bytes) -> int:
+        """
+        Appends data to the stdout ring buffer (OBUF) as much as free space
+        permits.
+
+        Returns:
+            Number of bytes written.
+        """
+        with self.lock:
+            widx = self.word(Hostio.OBUF_WIDX)
+            ridx = self.word(Hostio.OBUF_RIDX)
+            free = (ridx - widx - 1) & (Hostio.OBUF_SIZE - 1)
+            data = data[:free]
+            for b in data:
+                self.memory[Hostio.OBUF + widx] = b
+                widx = (widx + 1) & (Hostio.OBUF_SIZE - 1)
+            self.set_word(Hostio.OBUF_WIDX, widx)
+            return len(data)
+
+    def program_read(self) -> bytes:
+        """Consumes all pending data from the stdin ring buffer (IBUF)."""
+        with self.lock:
+            widx = self.word(Hostio.IBUF_WIDX)
+            ridx = self.word(Hostio.IBUF_RIDX)
+            data = bytearray()
+            while ridx != widx:
+                data.append(self.memory[Hostio.IBUF + ridx])
+                ridx = (ridx + 1) & (Hostio.IBUF_SIZE - 1)
+            self.set_word(Hostio.IBUF_RIDX, ridx)
+            return bytes(data)
+
+    def program_exit(self, retval: int):
+        """Sets RETVAL and the exit flag, as returning from main() does."""
+        with self.lock:
+            self.set_word(Hostio.RETVAL, retval & 0xffffffff)
+            self.set_word(Hostio.FLAGS, self.word(Hostio.FLAGS) | 1)
+
+if __name__=="__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6666
+    with FakeOpenOcdServer(port=port) as server:
+        print(f"Fake OpenOCD TCL server listening on port {server.port}.")
+        server.thread.join()
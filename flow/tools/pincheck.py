@@ -2,13 +2,13 @@
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
 import csv
-from lxml import objectify
 from types import SimpleNamespace
 from collections import namedtuple
 
 SignalPin = namedtuple('SignalPin', ['pin_number', 'use', 'io_standard', 'pull_type'])
 
 def read_pin_report_xml(filename) -> list[dict[str, str]]:
+    from lxml import objectify
     with open(filename, "br") as f:
         data = objectify.fromstring(f.read())
     tab = data.section[1].table
@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+import sys
+import threading
+from contextlib import contextmanager
+
+class PrefixedStdout:
+    """
+    Stand-in for sys.stdout that prefixes every line written by a thread
+    with the prefix that thread has set via prefix(). Lines are written
+    whole, so the output of concurrent threads is not mixed within lines.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def write(self, s):
+        prefix = getattr(self.local, 'prefix', None)
+        if prefix is None:
+            with self.lock:
+                return self.target.write(s)
+        *lines, self.local.buf = (self.local.buf + s).split('\n')
+        if lines:
+            with self.lock:
+                self.target.write(''.join(f"{prefix}{line}\n" for line in lines))
+                self.target.flush()
+        return len(s)
+
+    def flush(self):
+        with self.lock:
+            self.target.flush()
+
+    @contextmanager
+    def prefix(self, prefix: str):
+        self.local.prefix = prefix
+        self.local.buf = ''
+        try:
+            yield
+        finally:
+            if self.local.buf:
+                self.write('\n')
+            self.local.prefix = None
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+@contextmanager
+def prefixed_stdout():
+    """Installs PrefixedStdout as sys.stdout for the duration of the context."""
+    orig_stdout = sys.stdout
+    sys.stdout = PrefixedStdout(orig_stdout)
+    try:
+        yield sys.stdout
+    finally:
+        sys.stdout = orig_stdout
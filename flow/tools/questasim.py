@@ -2,12 +2,29 @@
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from notcl import TclTool, tclobj
 from pathlib import Path
+import fcntl
+import hashlib
+import json
 import os
+import shutil
+import signal
+import time
+from .buildcache import Manifest, file_digest, file_lock
+from . import svdeps
 
 class Vsim(TclTool):
-    def __init__(self, sdf, libs, plusargs, top_modules, *args, **kwargs):
+    def __init__(self, sdf, libs, plusargs, top_modules, *args, acc="+acc", optimized=False, **kwargs):
+        """
+        Args:
+            acc: Visibility passed to the implicit vopt run, or None for
+                full optimization.
+            optimized: top_modules is a design optimized by vopt before
+                (see optimize), which is loaded as is.
+        """
         super().__init__(*args, **kwargs)
 
         self.vsim_opts = []
@@ -15,7 +32,8 @@ class Vsim(TclTool):
 
         #self.vsim_opts += ['-v2k_int_delays']
         self.vsim_opts += ['+transport_int_delays']
-        self.vsim_opts += ["-voptargs=\"+acc\""]
+        if acc and not optimized:
+            self.vsim_opts += [f"-voptargs=\"{acc}\""]
         for key, value in sdf.items():
             self.vsim_opts += ["-sdfmin", f"{key}={value}"]
             self.vsim_opts += ["-sdfmax", f"{key}={value}"]
@@ -65,7 +83,9 @@ def simulate(
         timescale: str="1ps/1fs",
         plusargs: dict[str,str]={},
         netlist_sim=None,
-        libs: list=[]
+        libs: list=[],
+        compile_cache: Path=None,
+        acc: str="+acc"
         ):
     """
     Args:
@@ -86,44 +106,180 @@ def simulate(
         batch_mode: If True, run in batch mode instead of GUI.
         plusargs: Parameters passed to simulation,
             accessible via $value$plusargs in SystemVerilog.
+        compile_cache: If set, the design is compiled and optimized with
+            prepare, using this cache directory. Unless sdf is given, the
+            design is optimized by an explicit vopt run. The library is
+            kept from being recompiled until the simulation ends.
+        acc: Visibility of design objects (vopt +acc option), or None for
+            full optimization.
     """
 
-    compile(src_files, cwd, 'work', include_dirs, defines, timescale)
-
-
     if not isinstance(wave_do, (list, tuple)):
         wave_do = [wave_do]
 
-    with Vsim(sdf, libs, plusargs, top_module, cwd=cwd, interact=(not batch_mode)) as vsim:
-        if vcd_out:
-            vsim(f"vcd file {str(vcd_out)}")
-            vsim("vcd add -r /*")
-        #vsim.echo("Hello, world!")
-        if not batch_mode:
-            for dofile in wave_do: 
-                if not dofile.exists():
-                    with open(dofile, "x") as f:
-                        f.write("\n")
-                vsim.do(str(dofile))
-            fn_enc = tclobj.encode(str(wave_do[-1])) # assumption: last dofile in list is the one containing the wave view
+    if compile_cache:
+        prepared = prepare(src_files, top_module, cwd, compile_cache,
+            include_dirs, defines, timescale, libs, acc, optimize_design=(not sdf))
+    else:
+        compile(src_files, cwd, 'work', include_dirs, defines, timescale)
+        prepared = nullcontext((top_module, False))
+
+    with prepared as (top_module, optimized):
+        with Vsim(sdf, libs, plusargs, top_module, cwd=cwd, interact=(not batch_mode),
+                acc=acc, optimized=optimized) as vsim:
+            if vcd_out:
+                vsim(f"vcd file {str(vcd_out)}")
+                vsim("vcd add -r /*")
+            #vsim.echo("Hello, world!")
+            if not batch_mode:
+                for dofile in wave_do: 
+                    if not dofile.exists():
+                        with open(dofile, "x") as f:
+                            f.write("\n")
+                    vsim.do(str(dofile))
+                fn_enc = tclobj.encode(str(wave_do[-1])) # assumption: last dofile in list is the one containing the wave view
+
+                vsim(f'add button "Save Wave Format" {{write format wave {fn_enc}; echo "Wave format saved to {fn_enc}."}} NoDisable {{-bg #0c0}}')
+
+            if log_all: 
+                vsim("add log -r *")
+
+            if saif_out:
+                vsim("power add -in -inout -internal -out /*")
 
-            vsim(f'add button "Save Wave Format" {{write format wave {fn_enc}; echo "Wave format saved to {fn_enc}."}} NoDisable {{-bg #0c0}}')
+            if run_on_start or batch_mode:
+                vsim('run -a')
 
-        if log_all: 
-            vsim("add log -r *")
+            if not batch_mode:
+                vsim("view .main_pane.wave")
 
-        if saif_out:
-            vsim("power add -in -inout -internal -out /*")
+            if saif_out:
+                vsim(f"power report -all -bsaif {str(saif_out)}")
 
-        if run_on_start or batch_mode:
-            vsim('run -a')
 
-        if not batch_mode:
-            vsim("view .main_pane.wave")
+def vlog_version() -> str:
+    """Returns the version line printed by vlog -version."""
+    return subprocess.check_output(["vlog", "-version"], text=True).strip()
 
-        if saif_out:
-            vsim(f"power report -all -bsaif {str(saif_out)}")
+@contextmanager
+def prepare(
+        src_files: list[Path],
+        top_modules: list[str],
+        cwd: Path,
+        compile_cache: Path,
+        include_dirs: list[Path]=[],
+        defines: dict[str,str]={},
+        timescale: str="1ps/1fs",
+        libs: list=[],
+        acc: str="+acc",
+        optimize_design: bool=True
+        ):
+    """
+    Context manager that provides the library work in cwd for simulating
+    top_modules for the duration of the with block. It yields the top
+    modules or optimized design to load with vsim and whether it is an
+    optimized design (see Vsim).
+
+    If optimize_design, src_files are compiled into the work library of
+    their source set, a subdirectory of compile_cache named after the
+    digest of sources, include dirs, defines and timescale, which is linked
+    to cwd/work. Simulations of the same sources share the library, which is
+    compiled incrementally (see compile_incremental), and the design
+    optimized by an explicit vopt run (see optimize).
+
+    The shared library is only recompiled while no simulation uses it:
+    simulations hold a shared lock on it until the with block ends. If it
+    is in use and out of date, a private library is compiled in cwd
+    instead. Without optimize_design, vsim optimizes the design implicitly
+    into the library, so the library is always private.
+    """
+    if not optimize_design:
+        compile_incremental(src_files, cwd, cwd / "questa_work", 'work', include_dirs, defines, timescale)
+        yield top_modules, False
+        return
+
+    source_set = [[str(fn) for fn in src_files], [str(d) for d in include_dirs], defines, timescale]
+    digest = hashlib.sha256(json.dumps(source_set, default=str).encode()).hexdigest()
+    lib_dir = compile_cache / digest[:16]
+    with file_lock(lib_dir / "lock"):
+        # Simulations hold a shared lock on users.lock, compiling requires
+        # an exclusive one. Preparing is serialized by the lock above, so
+        # converting the exclusive to a shared lock cannot be interrupted.
+        users = open(lib_dir / "users.lock", 'a')
+        try:
+            fcntl.flock(users, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fcntl.flock(users, fcntl.LOCK_SH)
+            design = _shared_design(src_files, top_modules, lib_dir, include_dirs, defines, timescale, libs, acc)
+            if design is None:
+                users.close()
+        else:
+            try:
+                compile_incremental(src_files, cwd, lib_dir, 'work', include_dirs, defines, timescale)
+                design = optimize(top_modules, lib_dir, 'work', libs, acc)
+            except BaseException:
+                users.close()
+                raise
+            fcntl.flock(users, fcntl.LOCK_SH)
+
+    if design is None:
+        print(f"Library {lib_dir / 'work'} is in use by running simulations and out of date, "
+            "compiling a private library.")
+        private_dir = cwd / "questa_work"
+        compile_incremental(src_files, cwd, private_dir, 'work', include_dirs, defines, timescale)
+        yield [optimize(top_modules, private_dir, 'work', libs, acc)], True
+        return
+
+    with users:
+        link_library(cwd, lib_dir / 'work')
+        yield [design], True
+
+def _shared_design(src_files, top_modules, lib_dir, include_dirs, defines, timescale, libs, acc) -> str:
+    """
+    Returns the optimized design in the shared library lib_dir/work if the
+    library and design are up to date, else None.
+    """
+    to_compile, _, _, _ = _plan_incremental(src_files, lib_dir, 'work', include_dirs, defines, timescale)
+    if to_compile:
+        return None
+    design, _, key = _plan_optimize(top_modules, lib_dir, 'work', libs, acc)
+    key_file = lib_dir / f"{design}.vopt"
+    if not (key_file.exists() and key_file.read_text() == key):
+        return None
+    print(f"Library {lib_dir / 'work'} and optimized design {design} are up to date.")
+    return design
+
+def run_batch(
+        top_modules: list[str],
+        cwd: Path,
+        libs: list=[],
+        plusargs: dict[str,str]={},
+        timeout: float=None,
+        acc: str="+acc",
+        optimized: bool=False,
+        log_file: str="vsim.log"
+        ) -> int:
+    """
+    Runs a batch simulation to its end as a plain vsim process, without Tcl
+    interaction, writing its output to cwd/log_file. The library work must
+    be present in cwd and kept in place by prepare until vsim returns.
 
+    Returns the exit code of vsim, or None if the simulation did not finish
+    within timeout seconds and was killed.
+    """
+    vsim = Vsim({}, libs, plusargs, top_modules, cwd=cwd, acc=acc, optimized=optimized)
+    cmdline = ["vsim"] + vsim.vsim_opts + ["-do", "run -all; quit -f"]
+    with open(cwd / log_file, 'w') as log:
+        # In a session of its own, so that vsim's child processes can be
+        # killed along with it on timeout.
+        proc = subprocess.Popen(cmdline, cwd=cwd, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True)
+        try:
+            return proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+            return None
 
 def compile(
         src_files: list[Path],
@@ -131,9 +287,16 @@ def compile(
         lib_name: str="work",
         include_dirs: list[Path]=[],
         defines: dict[str,str]={},
-        timescale: str="1ps/1fs"
+        timescale: str="1ps/1fs",
+        stdout=None
         ):
+    """
+    Compiles src_files into library lib_name with vlog.
 
+    Args:
+        stdout: File object to which vlog output is written (stdout and
+            stderr). By default, vlog inherits the standard streams.
+    """
 
 
     vlog_opts = [
@@ -161,6 +324,210 @@ def compile(
     vlog_opts += [f"+define+{k}={v}" for k, v in defines.items()]
 
     vlog_opts += [str(fn) for fn in src_files]
-    subprocess.check_call(["vlog"]+vlog_opts, cwd=cwd)
+    subprocess.check_call(["vlog"]+vlog_opts, cwd=cwd,
+        stdout=stdout, stderr=(subprocess.STDOUT if stdout else None))
 
     return cwd / lib_name
+
+def compile_incremental(
+        src_files: list[Path],
+        cwd: Path,
+        cache_dir: Path,
+        lib_name: str="work",
+        include_dirs: list[Path]=[],
+        defines: dict[str,str]={},
+        timescale: str="1ps/1fs"
+        ):
+    """
+    Like compile, but keeps the library in cache_dir and, on subsequent
+    calls, compiles only the sources that changed and the sources depending
+    on them (see svdeps.recompile_set). cwd/lib_name is made a symlink to
+    the cached library.
+
+    Sources are compared by the digests of their contents and of the files
+    they include. The whole library is recompiled if there is no record of
+    a previous compile, if sources were removed, or if the vlog version,
+    the options (defines, include dirs, timescale) or the contents of the
+    include dirs changed.
+    """
+    to_compile, full, message, state = _plan_incremental(src_files, cache_dir, lib_name,
+        include_dirs, defines, timescale)
+    print(message)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if full:
+        shutil.rmtree(cache_dir / lib_name, ignore_errors=True)
+    if to_compile:
+        compile(to_compile, cache_dir, lib_name, include_dirs, defines, timescale)
+
+    state_file = cache_dir / f"{lib_name}.json"
+    tmp = state_file.with_name(f"{state_file.name}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, state_file)
+
+    return link_library(cwd, cache_dir / lib_name)
+
+def _plan_incremental(src_files, cache_dir, lib_name, include_dirs, defines, timescale):
+    """
+    Returns the sources compile_incremental has to compile, whether the
+    library has to be compiled from scratch, a message saying why, and the
+    state to record after compiling.
+    """
+    lib = cache_dir / lib_name
+    state_file = cache_dir / f"{lib_name}.json"
+
+    settings = Manifest()
+    settings.add_value('options', [timescale, [str(d) for d in include_dirs], defines])
+    settings.add_value('vlog', vlog_version())
+    for d in include_dirs:
+        settings.add_files(sorted(fn for fn in Path(d).rglob("*") if fn.is_file()))
+
+    srcs = [Path(fn) for fn in src_files]
+    infos = {src: svdeps.analyze(src, include_dirs) for src in srcs}
+    files = {str(src): {'key': svdeps.source_key(src, infos[src]), 'defines': infos[src].defines}
+        for src in srcs}
+
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        state = None
+
+    if state is None or not lib.exists():
+        reason = "no previous compile"
+    elif state['settings'] != settings.digest():
+        reason = "options, include dirs or vlog version changed"
+    elif set(state['files']) - set(files):
+        reason = "sources were removed"
+    else:
+        reason = None
+
+    new_state = {'settings': settings.digest(), 'files': files}
+    if reason:
+        return srcs, True, f"Compiling all {len(srcs)} sources into {lib_name} ({reason}).", new_state
+    changed = {src for src in srcs
+        if state['files'].get(str(src), {}).get('key') != files[str(src)]['key']}
+    old_defines = {Path(src): entry['defines'] for src, entry in state['files'].items()}
+    to_compile = svdeps.recompile_set(srcs, infos, changed, old_defines)
+    if to_compile:
+        message = (f"Compiling {len(to_compile)} of {len(srcs)} sources into {lib_name} "
+            f"({len(changed)} changed).")
+    else:
+        message = f"Library {lib_name} is up to date."
+    return to_compile, False, message, new_state
+
+def link_library(cwd: Path, lib: Path) -> Path:
+    """Makes cwd/<name of lib> a symlink to lib."""
+    link = cwd / lib.name
+    if link.is_symlink() or link.exists():
+        link.unlink()
+    link.symlink_to(lib.absolute())
+    return link
+
+def optimize(
+        top_modules: list[str],
+        cwd: Path,
+        lib_name: str="work",
+        libs: list=[],
+        acc: str="+acc"
+        ) -> str:
+    """
+    Optimizes top_modules of library cwd/lib_name with vopt into a named
+    design that vsim loads without optimizing again. Returns the design
+    name, <first top module>_acc or <first top module>_opt (acc=None, full
+    optimization).
+
+    vopt is skipped if the design was optimized before with the same
+    options from the same library state, as recorded by compile_incremental
+    in cwd/<lib_name>.json.
+    """
+    design, vopt_opts, key = _plan_optimize(top_modules, cwd, lib_name, libs, acc)
+    key_file = cwd / f"{design}.vopt"
+    if key_file.exists() and key_file.read_text() == key:
+        print(f"Optimized design {design} is up to date.")
+        return design
+
+    key_file.unlink(missing_ok=True)
+    subprocess.check_call(["vopt"] + vopt_opts, cwd=cwd)
+    key_file.write_text(key)
+    return design
+
+def _plan_optimize(top_modules, cwd, lib_name, libs, acc):
+    """Returns design name, vopt options and key of the optimize run."""
+    design = f"{top_modules[0]}_{'acc' if acc else 'opt'}"
+
+    vopt_opts = ['-work', lib_name]
+    if acc:
+        vopt_opts += [acc]
+    vopt_opts += ['+transport_int_delays']
+
+    # Same as in Vsim:
+    vopt_opts += ['-suppress', '14408']
+    vopt_opts += ['-suppress', '3015']
+
+    for l in libs:
+        vopt_opts += ['-L', str(l)]
+    vopt_opts += [m for m in top_modules]
+    vopt_opts += ['-o', design]
+
+    state_file = cwd / f"{lib_name}.json"
+    key = hashlib.sha256(json.dumps([vopt_opts, file_digest(state_file)]).encode()).hexdigest()
+    return design, vopt_opts, key
+
+def compile_sharded(
+        src_files: list[Path],
+        cwd: Path,
+        lib_name: str,
+        shards: int,
+        defines: dict[str,str]={}
+        ) -> list[Path]:
+    """
+    Compiles src_files with one vlog process per shard, each into its own
+    library <lib_name>_<n>. The returned library paths must all be passed
+    to vsim with -L.
+
+    Each shard has a library of its own, so no two vlog processes write
+    to the same library. Files are distributed by size, largest first, to
+    the shard with the fewest bytes so far. The output of each vlog is
+    written to <lib_name>_<n>.log and printed for failed shards. The wall
+    time of each shard is reported.
+    """
+    shards = max(1, min(shards, len(src_files)))
+    shard_srcs = [[] for _ in range(shards)]
+    shard_bytes = [0] * shards
+    for fn in sorted(src_files, key=lambda fn: (-os.path.getsize(fn), str(fn))):
+        n = shard_bytes.index(min(shard_bytes))
+        shard_srcs[n].append(fn)
+        shard_bytes[n] += os.path.getsize(fn)
+
+    def compile_shard(n):
+        start = time.perf_counter()
+        with open(cwd / f"{lib_name}_{n}.log", 'w') as log:
+            try:
+                compile(shard_srcs[n], cwd, f"{lib_name}_{n}", defines=defines, stdout=log)
+                ok = True
+            except subprocess.CalledProcessError:
+                ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(shards) as pool:
+        outcomes = list(pool.map(compile_shard, range(shards)))
+    total = time.perf_counter() - start
+
+    print(f"{lib_name}: {len(src_files)} files in {shards} shards, {total:.1f} s")
+    print(f"{'shard':>7s}  {'files':>5s}  {'MB':>6s}  {'time':>7s}")
+    failed = []
+    for n, (srcs, (seconds, ok)) in enumerate(zip(shard_srcs, outcomes)):
+        print(f"{n:7d}  {len(srcs):5d}  {shard_bytes[n]/1e6:6.1f}  {seconds:5.1f} s{'' if ok else '  FAILED'}")
+        if not ok:
+            failed.append(n)
+    for n in failed:
+        with open(cwd / f"{lib_name}_{n}.log") as log:
+            print(f"vlog output of {lib_name}_{n}:")
+            print(log.read())
+    if failed:
+        raise Exception(f"vlog failed for {lib_name} shards: {', '.join(map(str, failed))}")
+
+    return [cwd / f"{lib_name}_{n}" for n in range(shards)]
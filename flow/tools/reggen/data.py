@@ -4,6 +4,13 @@
 
 from .field_enums import HwAccess, SwAccess, SwRdAccess, SwWrAccess
 
+# bit types counted by get_n_bits, in the order of the precomputed counts
+BITTYPES = ("q", "d", "qe", "re", "de")
+
+# hwaccess values with reg2hw (q, qe, re) and hw2reg (d, de) signals
+_REG2HW = (HwAccess.HRW, HwAccess.HRO)
+_HW2REG = (HwAccess.HRW, HwAccess.HWO)
+
 
 # helper funtion that strips trailing number from name
 # TODO: this is a workaround, should solve this in validate.py
@@ -15,24 +22,37 @@ def _get_basename(name):
     return ""
 
 
+def _sum_bits(n_bits, bittype):
+    """Sums up precomputed per-type bit counts (ordered as BITTYPES) of the
+    types in bittype."""
+    return sum(n for t, n in zip(BITTYPES, n_bits) if t in bittype)
+
+
+def _add_bit_counts(items):
+    """Adds up the per-type bit counts of fields or registers"""
+    q = d = qe = re = de = 0
+    for i in items:
+        n_bits = i.get_bit_counts()
+        q += n_bits[0]
+        d += n_bits[1]
+        qe += n_bits[2]
+        re += n_bits[3]
+        de += n_bits[4]
+    return (q, d, qe, re, de)
+
+
 class Field():
     """Field in a register.
 
     Field class contains necessary info to generate RTL code.
     It has two additional (tool generated) fields, swrdaccess and swwraccess,
     which represent read and write type. This makes RTL generation code simpler.
+
+    The data model classes use __slots__, as large multiregs expand into
+    thousands of objects. Defaults are set in __init__ only.
     """
-    name = ""  # required
-    msb = 31  # required
-    lsb = 0  # required
-    resval = 0  # optional
-    swaccess = SwAccess.NONE  # optional
-    swrdaccess = SwRdAccess.NONE
-    swwraccess = SwWrAccess.NONE
-    hwaccess = HwAccess.HRO
-    hwqe = False
-    hwre = False
-    hwext = False
+    __slots__ = ('name', 'msb', 'lsb', 'resval', 'swaccess', 'swrdaccess',
+                 'swwraccess', 'hwaccess', 'hwqe', 'hwre', 'hwext')
 
     def __init__(self):
         self.name = ""  # required
@@ -61,6 +81,14 @@ class Field():
             n_bits += not self.hwext
         return n_bits
 
+    def get_bit_counts(self):
+        """Returns the number of bits of each type in BITTYPES"""
+        width = self.msb - self.lsb + 1
+        reg2hw = self.hwaccess in _REG2HW
+        hw2reg = self.hwaccess in _HW2REG
+        return (width * reg2hw, width * hw2reg, self.hwqe * reg2hw,
+                self.hwre * reg2hw, (not self.hwext) * hw2reg)
+
     def get_fields_flat(self):
         return [self]
 
@@ -69,17 +97,8 @@ class Field():
 
 
 class Reg():
-    name = ""
-    offset = 0
-    hwqe = False
-    hwre = False
-    hwext = False  # External register
-    resval = 0
-    dvrights = "RO"  # Used by UVM REG only
-    regwen = ""
-    fields = []
-    width = 0  # indicate register size
-    ishomog = 0
+    __slots__ = ('name', 'offset', 'hwqe', 'hwre', 'hwext', 'resval',
+                 'dvrights', 'regwen', 'fields', 'width', 'ishomog')
 
     def __init__(self, name=""):
         self.name = name
@@ -91,13 +110,17 @@ class Reg():
         self.dvrights = "RO"  # Used by UVM REG only
         self.regwen = ""
         self.fields = []
-        self.width = 0
+        self.width = 0  # indicate register size
         self.ishomog = 0
 
     def is_multi_reg(self):
         """Returns true if this is a multireg"""
         return False
 
+    def get_bit_counts(self):
+        """Returns the number of bits of each type in BITTYPES"""
+        return _add_bit_counts(self.fields)
+
     def get_n_bits(self, bittype=["q"]):
         """Returns number of bits in this register (including all multiregs and
         fields). By default this function counts read data bits (bittype "q"),
@@ -179,37 +202,69 @@ class Reg():
 
 
 class MultiReg(Reg):
-    param = ""
+    """Replicated register.
+
+    The flat field and register lists and the bit counts of the top-level
+    multiregs of a block are precomputed by Block.precompute(), which
+    json_to_reg calls once the block is complete, as the templates query them
+    many times per register. Nested multiregs and plain registers are not
+    cached: their tables would only duplicate the ones of the top-level
+    multireg or the fields list. Modifying fields after precompute()
+    requires calling it again.
+    """
+    __slots__ = ('param', '_flat')
 
     def __init__(self, name):
         Reg.__init__(self, name)
         self.param = ""
+        self._flat = None  # (fields_flat, regs_flat, bit counts) or None
 
     def is_multi_reg(self):
         """Returns true if this is a multireg"""
         return True
 
+    def precompute(self):
+        """Precomputes the flat field and register lists and the per-type
+        bit counts of this multireg."""
+        self._flat = None
+        self._flat = (self.get_fields_flat(), self.get_regs_flat(),
+                      self.get_bit_counts())
+
+    def get_bit_counts(self):
+        if self._flat is not None:
+            return self._flat[2]
+        return Reg.get_bit_counts(self)
+
+    def get_n_bits(self, bittype=["q"]):
+        if self._flat is not None:
+            return _sum_bits(self._flat[2], bittype)
+        return Reg.get_n_bits(self, bittype)
+
+    def get_fields_flat(self):
+        if self._flat is not None:
+            return self._flat[0]
+        return Reg.get_fields_flat(self)
+
+    def get_regs_flat(self):
+        if self._flat is not None:
+            return self._flat[1]
+        return Reg.get_regs_flat(self)
+
 
 class Window():
-    base_addr = 0
-    limit_addr = 0
-    n_bits = 0
+    __slots__ = ('name', 'base_addr', 'limit_addr', 'n_bits', 'dvrights')
 
     def __init__(self):
+        self.name = ""
         self.base_addr = 0
         self.limit_addr = 0
         self.n_bits = 0
+        self.dvrights = "RO"
 
 
 class Block():
-    width = 32
-    addr_width = 12
-    base_addr = 0
-    name = ""
-    regs = []
-    wins = []
-    blocks = []
-    params = []
+    __slots__ = ('width', 'addr_width', 'base_addr', 'name', 'regs', 'wins',
+                 'blocks', 'params', '_regs_flat', '_n_bits')
 
     def __init__(self):
         self.width = 32
@@ -220,10 +275,25 @@ class Block():
         self.wins = []
         self.blocks = []
         self.params = []
+        self._regs_flat = None
+        self._n_bits = None
+
+    def precompute(self):
+        """Precomputes the flat register list and the per-type bit counts
+        of the block and of its multiregs (see MultiReg)."""
+        self._regs_flat = None
+        self._n_bits = None
+        for r in self.regs:
+            if isinstance(r, MultiReg):
+                r.precompute()
+        self._regs_flat = self.get_regs_flat()
+        self._n_bits = _add_bit_counts(self.regs)
 
     def get_regs_flat(self):
         """Returns flattened register list
         """
+        if self._regs_flat is not None:
+            return self._regs_flat
         regs = []
         for r in self.regs:
             regs += r.get_regs_flat()
@@ -235,6 +305,8 @@ class Block():
         but other bits such as "d", qe", "re", "de" can be counted as well by
         specifying them in the bittype list argument.
         """
+        if self._n_bits is not None:
+            return _sum_bits(self._n_bits, bittype)
         n_bits = 0
         for r in self.regs:
             n_bits += r.get_n_bits(bittype)
@@ -13,9 +13,9 @@ import operator
 import sys
 from pathlib import Path
 
-from mako.template import Template
 from mako import exceptions
 import importlib.resources
+from ..templates import load_template
 
 from .data import *
 from .field_enums import HwAccess, SwAccess, SwRdAccess, SwWrAccess
@@ -175,6 +175,9 @@ def json_to_reg(obj):
     else:
         block.addr_width = (obj["gensize"] - 1).bit_length()
 
+    # The templates query flat lists and bit counts many times per register
+    block.precompute()
+
     return block
 
 def gen_rtl(obj, pkg_sv_filename, top_sv_filename):
@@ -184,8 +187,8 @@ def gen_rtl(obj, pkg_sv_filename, top_sv_filename):
 
     # Read Register templates
     pkg = importlib.resources.files(__package__)
-    reg_top_tpl = Template((pkg / 'reg_top.sv.tpl').read_text())
-    reg_pkg_tpl = Template((pkg / 'reg_pkg.sv.tpl').read_text())
+    reg_top_tpl = load_template(pkg / 'reg_top.sv.tpl')
+    reg_pkg_tpl = load_template(pkg / 'reg_pkg.sv.tpl')
 
     # Generate pkg.sv with block name
     with open(pkg_sv_filename, 'w', encoding='UTF-8') as fout:
@@ -11,10 +11,37 @@ Register JSON validation
 
 import logging as log
 import sys
+from collections import Counter
 
 from .field_enums import *
 
 
+class NameList(list):
+    """List of names with constant-time membership test
+
+    Used for the name lists (genrnames, genwennames) that are built up
+    during validation and searched for every register.
+    """
+    def __init__(self, names=()):
+        super().__init__(names)
+        self.counts = Counter(self)
+
+    def append(self, name):
+        super().append(name)
+        self.counts[name] += 1
+
+    def pop(self, *args):
+        name = super().pop(*args)
+        self.counts[name] -= 1
+        return name
+
+    def __contains__(self, name):
+        return self.counts[name] > 0
+
+    def __reduce__(self):
+        return (NameList, (list(self), ))
+
+
 # Routine that can be used for Hjson object_pairs_hook
 # The baseline is dict(pairs) i.e. construct a dictonary from pairs
 # The usual is OrderedDict(pairs) which is redundant in latest python
@@ -245,15 +272,12 @@ def bitmask(bfield):
         brange = bfield.partition(':')
         msb = brange[0]
         lsb = brange[2]
-        res = 0
         if ((not msb.isdecimal()) or (not lsb.isdecimal()) or
             (int(lsb) > int(msb))):
             log.error("Bad bit range " + bfield + str(brange))
             return (0, 0, 0)
-        else:
-            for i in range(int(lsb), int(msb) + 1):
-                res |= (1 << i)
-        return (res, int(msb) - int(lsb) + 1, int(lsb))
+        width = int(msb) - int(lsb) + 1
+        return (((1 << width) - 1) << int(lsb), width, int(lsb))
     if (not bfield.isdecimal()):
         log.error("Bad bit number " + bfield)
         return (0, 0, 0)
@@ -545,7 +569,7 @@ hwaccess_permitted = {
 key_use = {'r': "required", 'o': "optional", 'a': "added by tool"}
 
 # Register name prohibited (used as reserved keywords in systemverilog)
-keywords_verilog = [
+keywords_verilog = frozenset([
     'alias', 'always', 'always_comb', 'always_ff', 'always_latch', 'and',
     'assert', 'assign', 'assume', 'automatic', 'before', 'begin', 'bind',
     'bins', 'binsof', 'bit', 'break', 'buf', 'bufif0', 'bufif1', 'byte',
@@ -579,7 +603,7 @@ keywords_verilog = [
     'unique', 'unsigned', 'use', 'uwire', 'var', 'vectored', 'virtual', 'void',
     'wait', 'wait_order', 'wand', 'weak0', 'weak1', 'while', 'wildcard',
     'wire', 'with', 'within', 'wor', 'xnor', 'xor'
-]
+])
 
 
 def validate_fields(fields, rname, default_sw, default_hw, full_resval,
@@ -590,7 +614,7 @@ def validate_fields(fields, rname, default_sw, default_hw, full_resval,
     gen_resmask = 0
     fcount = 0
 
-    fieldnames = []
+    fieldnames = set()
     if len(fields) == 0:
         log.warn(rname + " fields is empty")
 
@@ -616,7 +640,7 @@ def validate_fields(fields, rname, default_sw, default_hw, full_resval,
                     log.error(rname + " field " + str(fcount) +
                               ": duplicate use of field name " + fname)
                 else:
-                    fieldnames.append(fname)
+                    fieldnames.add(fname)
                 fname = rname + "." + fname
         ck_err = check_keys(field, field_required, field_optional, field_added,
                             fname)
@@ -630,7 +654,7 @@ def validate_fields(fields, rname, default_sw, default_hw, full_resval,
                 log.error(fname + ":no swaccess or register default swaccess")
                 swaccess = "wo"
             else:
-                log.info(fname + ": use register default swaccess")
+                log.info("%s: use register default swaccess", fname)
                 field['swaccess'] = default_sw
                 swaccess = default_sw
         else:
@@ -650,7 +674,7 @@ def validate_fields(fields, rname, default_sw, default_hw, full_resval,
                 log.error(fname + ": no hwaccess or register default hwaccess")
                 hwaccess = "hro"
             else:
-                log.info(fname + ": use register default hwaccess")
+                log.info("%s: use register default hwaccess", fname)
                 field['hwaccess'] = default_hw
                 hwaccess = default_hw
         else:
@@ -719,17 +743,17 @@ def validate_fields(fields, rname, default_sw, default_hw, full_resval,
                 gen_resmask |= field_bits[0]
                 field['genresval'] = resval
                 field['genresvalx'] = False
-                log.info(fname + ": use register default genresval")
+                log.info("%s: use register default genresval", fname)
             else:
                 if swaccess[0] != 'w':
                     field['genresval'] = 0
                     field['genresvalx'] = False
-                    log.info(fname + ": use zero genresval")
+                    log.info("%s: use zero genresval", fname)
                     gen_resmask |= field_bits[0]
                 else:
                     field['genresval'] = 0
                     field['genresvalx'] = True
-                    log.info(fname + ": use x genresval")
+                    log.info("%s: use x genresval", fname)
 
         if 'enum' in field:
             if max_in_field > 127:
@@ -902,7 +926,7 @@ def validate_register(reg, offset, width, top):
     if ((reg['regwen'] != '') and (not reg['regwen'] in top['genwennames'])):
         top['genwennames'].append(reg['regwen'])
 
-    log.info(rname + "@" + hex(offset) + " " + str(error) + " errors. Mask " +
+    log.info("%s@%s %d errors. Mask %s", rname, hex(offset), error,
              hex(gen[3]))
 
     return error
@@ -1217,7 +1241,6 @@ below checks for both and additional regwen properties.
 
 def check_wen_regs(regs):
     error = 0
-    idx = 0
 
     # Construct Tuple
     # 0 - name
@@ -1240,22 +1263,28 @@ def check_wen_regs(regs):
     # Need to check in register names and field list in case of multireg
     reg_list.extend(field_list)
 
+    # Index of the first entry of each name
+    reg_index = {}
+    for r in reg_list:
+        reg_index.setdefault(r[tuple_name], r)
+
     # check for reset value
     # both w1c and w0c are acceptable
     for x in regs['genwennames']:
         target = x.lower()
         log.info("check_wen_regs::Searching for %s" % target)
-        try:
-            idx = [r[tuple_name] for r in reg_list].index(target)
-        except ValueError:
+        if target not in reg_index:
+            error += 1
             log.error("Could not find register name matching %s" % target)
+            continue
+        reg = reg_index[target]
 
-        if not reg_list[idx][tuple_rstval]:
+        if not reg[tuple_rstval]:
             error += 1
             log.error(x + " used as regwen fails requirement to default " +
                       "to 1")
 
-        if not reg_list[idx][tuple_swaccess] in ["rw0c", "rw1c"]:
+        if not reg[tuple_swaccess] in ["rw0c", "rw1c"]:
             error += 1
             log.error(x +
                       " used as regwen fails requirement to be W1C or W0C ")
@@ -1278,8 +1307,8 @@ def validate(regs, **kwargs):
     if (error > 0):
         log.error("Component has top level errors. Aborting.")
         return error
-    regs['genrnames'] = []
-    regs['genwennames'] = []
+    regs['genrnames'] = NameList()
+    regs['genwennames'] = NameList()
     error = 0
 
     if 'regwidth' in regs:
@@ -1413,8 +1442,8 @@ def validate(regs, **kwargs):
         regs['registers'] = autoregs
         regs['genautoregs'] = True
 
-    log.info("Validated, size = " + hex(regs['gensize']) + " errors=" +
-             str(error) + " names are " + str(regs['genrnames']))
+    log.info("Validated, size = %s errors=%d names are %s",
+             hex(regs['gensize']), error, regs['genrnames'])
     if (error > 0):
         log.error("Register description had " + str(error) + " error" +
                   "s" if error > 1 else "")
@@ -1,11 +1,12 @@
 # SPDX-License-Identifier: Apache-2.0
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
-import hjson
 from pathlib import Path
-from .reggen import gen_ctheader, gen_html, gen_rtl, validate
 
 def run_reggen(input_hjson_fn: Path, output_pkg_sv: Path = None, output_top_sv: Path = None, output_header: Path = None, output_html: Path = None):
+    import hjson
+    from .reggen import gen_ctheader, gen_html, gen_rtl, validate
+
     with open(input_hjson_fn) as f:
         obj = hjson.load(f) #, use_decimal=True, object_pairs_hook=validate.checking_dict)
     
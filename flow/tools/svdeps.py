@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+"""
+Lightweight dependency analysis of (System)Verilog sources for incremental
+compilation.
+
+This is not a parser: comments are stripped and packages, package
+references, includes and macros are found with regular expressions. That
+is enough to find which compilation units have to be recompiled together.
+"""
+
+import re
+from collections import namedtuple
+from pathlib import Path
+
+from .buildcache import file_digest
+
+SourceInfo = namedtuple('SourceInfo', [
+    'packages',     # packages defined in the file
+    'imports',      # names used as package scope (pkg::...)
+    'includes',     # resolved paths of included files (recursively)
+    'defines',      # macros defined, including by included files
+    'macros',       # macros used (`NAME, `ifdef NAME, ...)
+])
+
+directives = frozenset([
+    'begin_keywords', 'celldefine', 'default_nettype', 'define', 'else',
+    'elsif', 'end_keywords', 'endcelldefine', 'endif', 'ifdef', 'ifndef',
+    'include', 'line', 'nounconnected_drive', 'pragma', 'resetall',
+    'timescale', 'unconnected_drive', 'undef', 'undefineall',
+    '__FILE__', '__LINE__',
+])
+
+re_comment = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+re_package = re.compile(r'^\s*package\s+(?:automatic\s+|static\s+)?(\w+)\s*;', re.MULTILINE)
+re_scope = re.compile(r'\b(\w+)\s*::')
+re_include = re.compile(r'`include\s+"([^"]+)"')
+re_define = re.compile(r'`define\s+(\w+)')
+re_macro = re.compile(r'`(\w+)')
+re_ifdef = re.compile(r'`(?:ifdef|ifndef|elsif)\s+(\w+)')
+
+def resolve_include(name: str, src: Path, include_dirs: list[Path]) -> Path:
+    """Returns the path of an included file like vlog finds it, or None."""
+    for d in [src.parent] + list(include_dirs):
+        candidate = Path(d) / name
+        if candidate.exists():
+            return candidate
+    return None
+
+def analyze(src: Path, include_dirs: list[Path]=[], _seen=None) -> SourceInfo:
+    """Returns SourceInfo of src, following its includes."""
+    with open(src, errors='replace') as f:
+        text = re_comment.sub('', f.read())
+    packages = set(re_package.findall(text))
+    imports = set(re_scope.findall(text)) - packages
+    defines = set(re_define.findall(text))
+    macros = (set(re_macro.findall(text)) - directives) | set(re_ifdef.findall(text))
+    includes = set()
+    seen = _seen if _seen is not None else {Path(src)}
+    for name in re_include.findall(text):
+        inc = resolve_include(name, Path(src), include_dirs)
+        if inc is None or inc in seen:
+            continue
+        seen.add(inc)
+        sub = analyze(inc, include_dirs, seen)
+        includes |= {inc} | set(sub.includes)
+        packages |= set(sub.packages)
+        imports |= set(sub.imports)
+        defines |= set(sub.defines)
+        macros |= set(sub.macros)
+    return SourceInfo(sorted(packages), sorted(imports - packages),
+        sorted(str(inc) for inc in includes), sorted(defines), sorted(macros - defines))
+
+def source_key(src: Path, info: SourceInfo) -> str:
+    """Returns a digest of src and the files it includes."""
+    digests = [file_digest(src)] + [file_digest(inc) for inc in info.includes]
+    return ":".join(digests)
+
+def recompile_set(srcs: list[Path], infos: dict[Path, SourceInfo], changed: set[Path],
+        old_defines: dict[Path, list[str]]={}) -> list[Path]:
+    """
+    Returns the sources (in the order of srcs) that have to be compiled
+    after the sources in changed were modified:
+
+    - A recompiled file that defines a package makes all files using the
+      package out of date.
+    - A changed file that defines a macro (now or, according to
+      old_defines, in its previous version) affects all later files using
+      the macro, as with -mfcu=macro macros carry over to subsequent files.
+    - Earlier files defining macros used by a recompiled file are compiled
+      along to provide the definitions.
+    """
+    index = {src: i for i, src in enumerate(srcs)}
+    pkg_users = {}
+    macro_users = {}
+    macro_defs = {}
+    for src in srcs:
+        for pkg in infos[src].imports:
+            pkg_users.setdefault(pkg, []).append(src)
+        for macro in infos[src].macros:
+            macro_users.setdefault(macro, []).append(src)
+        for macro in infos[src].defines:
+            macro_defs.setdefault(macro, []).append(src)
+
+    compile_set = set(changed)
+    todo = list(changed)
+    while todo:
+        src = todo.pop()
+        affected = []
+        for pkg in infos[src].packages:
+            affected += pkg_users.get(pkg, [])
+        if src in changed:
+            for macro in set(infos[src].defines) | set(old_defines.get(src, [])):
+                affected += [user for user in macro_users.get(macro, []) if index[user] > index[src]]
+        for macro in infos[src].macros:
+            affected += [d for d in macro_defs.get(macro, []) if index[d] < index[src]]
+        for dep in affected:
+            if dep not in compile_set:
+                compile_set.add(dep)
+                todo.append(dep)
+    return sorted(compile_set, key=index.get)
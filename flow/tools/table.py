@@ -0,0 +1,20 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+def print_table(header: tuple, rows: list[tuple], left: tuple[int]=(0,)):
+    """
+    Prints a summary table with a header line, preceded by an empty line.
+    Columns are as wide as their widest entry; the columns with an index in
+    left are left-aligned, all others right-aligned.
+    """
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+
+    def line(row):
+        cols = (f"{col:<{w}}" if i in left else f"{col:>{w}}" for i, (col, w) in enumerate(zip(row, widths)))
+        return "  ".join(cols).rstrip()
+
+    print()
+    print(line(header))
+    print("  ".join("-"*w for w in widths))
+    for row in rows:
+        print(line(row))
@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+import hashlib
+import os
+import stat
+from pathlib import Path
+import mako
+from mako.template import Template
+from .buildcache import user_cache_dir
+
+_templates = {}
+
+def template_cache_dir() -> Path:
+    """
+    Returns the directory of the compiled template modules. It is private to
+    the user, as user_cache_dir() may be shared via $RVLAB_CACHE_DIR and the
+    modules are imported.
+    """
+    return user_cache_dir() / f"mako-{os.getuid()}"
+
+def _trusted(path: Path) -> bool:
+    """Returns True if path is owned by the current user and not writable by others."""
+    st = path.stat()
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+def load_template(filename: Path) -> Template:
+    """
+    Returns the mako Template for filename.
+
+    Templates are memoized in-process by path and content digest. The Python
+    module mako compiles a template to is kept in template_cache_dir() under
+    a name containing the digest, so that other processes (worker processes,
+    later flow runs) import the compiled module instead of parsing and
+    compiling the template again. The cache is not used if the directory or
+    module is not owned by the user or writable by others, or if the module
+    cannot be written.
+    """
+    filename = Path(filename)
+    h = hashlib.sha256(filename.read_bytes())
+    h.update(mako.__version__.encode())
+    digest = h.hexdigest()[:16]
+    key = (str(filename), digest)
+    if key not in _templates:
+        module_filename = None
+        try:
+            cache_dir = template_cache_dir()
+            cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            module_file = cache_dir / f"{filename.name}.{digest}.py"
+            if _trusted(cache_dir) and (not module_file.exists() or _trusted(module_file)):
+                module_filename = str(module_file)
+        except OSError:
+            pass
+        try:
+            template = Template(filename=str(filename),
+                module_filename=module_filename,
+                input_encoding='utf-8')
+        except OSError:
+            if module_filename is None:
+                raise
+            template = Template(filename=str(filename), input_encoding='utf-8')
+        _templates[key] = template
+    return _templates[key]
@@ -7,8 +7,8 @@
 
 import logging as log
 from mako import exceptions
-from mako.template import Template
 import importlib.resources
+from ..templates import load_template
 from pathlib import Path
 
 from .item import NodeType
@@ -22,9 +22,9 @@ def generate(xbar):  #xbar: Xbar -> str
     """
 
     pkg = importlib.resources.files(__package__)
-    xbar_rtl_tpl = Template((pkg / 'xbar.rtl.sv.tpl').read_text())
-    xbar_pkg_tpl = Template((pkg / 'xbar.pkg.sv.tpl').read_text())
-    xbar_core_tpl = Template((pkg / 'xbar.core.tpl').read_text())
+    xbar_rtl_tpl = load_template(pkg / 'xbar.rtl.sv.tpl')
+    xbar_pkg_tpl = load_template(pkg / 'xbar.pkg.sv.tpl')
+    xbar_core_tpl = load_template(pkg / 'xbar.core.tpl')
 
     try:
         out_rtl = xbar_rtl_tpl.render(xbar=xbar, ntype=NodeType)
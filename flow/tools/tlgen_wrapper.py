@@ -1,8 +1,6 @@
 # SPDX-License-Identifier: Apache-2.0
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
-import hjson
-from . import tlgen
 from pydesignflow import Block, action, Result
 from pathlib import Path
 
@@ -13,6 +11,8 @@ def run_tlgen(input_fn: Path, output_rtl_sv: Path, output_pkg_sv: Path):
         output_dir: Output directory
         result: pydesignflow Result object that will be modified
     """    
+    import hjson
+    from . import tlgen
 
     with open(input_fn) as f_in:
         obj = hjson.load(f_in, use_decimal=True)
@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: Apache-2.0
+# SPDX-FileCopyrightText: 2026 RVLab Contributors
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .buildcache import user_cache_dir, file_lock
+
+toolchain_prefixes = [
+    "riscv-none-elf-",
+    "riscv32-unknown-elf-",
+    "riscv-none-embed-",
+]
+
+# Extensions probed in addition to the base ISA rv32i:
+probed_extensions = ["m", "a", "c", "zicsr", "zifencei", "zba", "zbb", "zbs"]
+
+class Toolchain:
+    """
+    RISC-V GCC toolchain found in PATH, together with the results of
+    capability probing (see probe_toolchain).
+    """
+
+    attrs = ['prefix', 'gcc', 'objdump', 'ar', 'version', 'extensions', 'multilib']
+
+    def __init__(self, **kwargs):
+        for key in self.attrs:
+            setattr(self, key, kwargs[key])
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.attrs}
+
+    def adapt_arch(self, arch: str) -> str:
+        """
+        Removes multi-letter extensions (e.g. _zicsr) that the toolchain does
+        not support from arch. Older toolchains implied zicsr in the base ISA
+        and reject it as an explicit extension.
+        """
+        base, *extensions = arch.split('_')
+        return '_'.join([base] + [ext for ext in extensions if ext in self.extensions])
+
+def find_toolchain_prefix() -> str:
+    for prefix in toolchain_prefixes:
+        if shutil.which(f"{prefix}gcc"):
+            return prefix
+    raise Exception("Could not find RISC-V GCC toolchain.")
+
+def march_supported(gcc: str, arch: str, abi: str="ilp32") -> bool:
+    """Tests whether gcc accepts arch by compiling a stub."""
+    proc = subprocess.run([gcc, "-x", "c", "-c", "-", "-o", os.devnull,
+        f"-march={arch}", f"-mabi={abi}"],
+        input=b"int stub;\n", capture_output=True)
+    return proc.returncode == 0
+
+def probe_extensions(gcc: str) -> list[str]:
+    def probe(ext):
+        arch = f"rv32i{ext}" if len(ext) == 1 else f"rv32i_{ext}"
+        return march_supported(gcc, arch)
+    with ThreadPoolExecutor() as pool:
+        supported = list(pool.map(probe, probed_extensions))
+    return [ext for ext, ok in zip(probed_extensions, supported) if ok]
+
+def probe(prefix: str) -> Toolchain:
+    gcc = shutil.which(f"{prefix}gcc")
+    version = subprocess.check_output([gcc, "--version"], text=True).splitlines()[0]
+    multilib = subprocess.check_output([gcc, "-print-multi-lib"], text=True).split()
+    return Toolchain(
+        prefix=prefix,
+        gcc=gcc,
+        objdump=shutil.which(f"{prefix}objdump"),
+        # Host ar works for RISC-V objects as well, fall back to it:
+        ar=shutil.which(f"{prefix}ar") or shutil.which("ar"),
+        version=version,
+        extensions=probe_extensions(gcc),
+        multilib=multilib,
+    )
+
+def probe_key(gcc: str) -> dict:
+    return {
+        'path_env': os.environ.get('PATH', ''),
+        'gcc_mtime': os.stat(gcc).st_mtime,
+    }
+
+def toolchain_cache_file() -> Path:
+    """
+    Returns the probe cache file of the current environment, in the cache
+    directory shared by all build directories of the user. Each PATH has a
+    file of its own, so switching between environments does not reprobe.
+    """
+    path_digest = hashlib.sha256(os.environ.get('PATH', '').encode()).hexdigest()
+    return user_cache_dir() / "toolchain" / f"{path_digest[:16]}.json"
+
+_probed = {}
+_probe_lock = threading.Lock()
+
+def probe_toolchain(cache_file: Path=None) -> Toolchain:
+    """
+    Returns the toolchain, probing it only if necessary.
+
+    The result is memoized in-process and, with cache_file (see
+    toolchain_cache_file), on disk. The disk cache is valid as long as PATH
+    and the modification time of the cached gcc are unchanged, so no PATH
+    scan or compiler invocation is needed in the common case.
+
+    Concurrent calls (threads of SwAll.build, other flow processes) are
+    serialized, so the toolchain is probed once.
+    """
+    with _probe_lock:
+        if cache_file in _probed:
+            return _probed[cache_file]
+        if cache_file:
+            with file_lock(cache_file.with_name(f"{cache_file.name}.lock")):
+                toolchain = _probe_cached(cache_file)
+        else:
+            toolchain = _probe_cached(None)
+        _probed[cache_file] = toolchain
+        return toolchain
+
+def _probe_cached(cache_file: Path) -> Toolchain:
+    toolchain = None
+    if cache_file:
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if cached['key'] == probe_key(cached['toolchain']['gcc']):
+                toolchain = Toolchain(**cached['toolchain'])
+        except (FileNotFoundError, OSError, KeyError, TypeError, json.JSONDecodeError):
+            pass
+
+    if not toolchain:
+        toolchain = probe(find_toolchain_prefix())
+        print(f"Found toolchain {toolchain.gcc} ({toolchain.version}), "
+            f"extensions: {', '.join(toolchain.extensions)}")
+        if cache_file:
+            fd, tmp = tempfile.mkstemp(dir=cache_file.parent, prefix=f"{cache_file.name}.", suffix=".tmp")
+            # Readable by other users sharing the cache (mkstemp uses 0600).
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': probe_key(toolchain.gcc), 'toolchain': toolchain.to_dict()}, f, indent=2)
+            os.replace(tmp, cache_file)
+
+    return toolchain
@@ -2,7 +2,10 @@
 # SPDX-FileCopyrightText: 2024 RVLab Contributors
 
 from notcl import TclTool
+import functools
 import os
+import re
+import subprocess
 from pathlib import Path
 
 class Vivado(TclTool):
@@ -18,3 +21,18 @@ class Vivado(TclTool):
 
 def vivado_dir():
     return Path(os.environ["XILINX_VIVADO"])
+
+def vivado_version() -> str:
+    """
+    Returns the version (e.g. 2023.2) of the Vivado installation in
+    XILINX_VIVADO, as printed by vivado -version.
+    """
+    return _vivado_version(vivado_dir())
+
+@functools.cache
+def _vivado_version(vivado_dir: Path) -> str:
+    out = subprocess.check_output([str(vivado_dir / "bin" / "vivado"), "-version"], text=True)
+    m = re.search(r'\bv(\d+\.\d+(?:\.\d+)?)\b', out)
+    if not m:
+        raise Exception(f"Failed to read Vivado version from 'vivado -version' output:\n{out}")
+    return m.group(1)
@@ -3,20 +3,28 @@
 
 from pydesignflow import Block, task, Result
 from .tools.tlgen_wrapper import run_tlgen
+from .tools.genpool import run_generators
 import re
 
 class XbarGenerator(Block):
     """Crossbar switch generator using OpenTitan's tlgen"""
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, processes=None, **kwargs):
+        """
+        Args:
+            processes: Number of worker processes for generating crossbars
+                in parallel (see run_generators). 1 generates all crossbars
+                in the flow process.
+        """
         super().__init__(*args, **kwargs)
+        self.processes = processes
 
     def setup(self):
         self.src_dir = self.flow.base_dir / "src"
         self.design_dir = self.src_dir / "design"
 
     def find_xbars(self):
-        for hjson_input_fn in (self.design_dir / "tlgen").iterdir():
+        for hjson_input_fn in sorted((self.design_dir / "tlgen").iterdir()):
             m = re.match(r"xbar_(.*).hjson", hjson_input_fn.name)
             if not m:
                 continue
@@ -28,11 +36,13 @@ class XbarGenerator(Block):
         """Generate SystemVerilog sources"""
         r = Result()
         r.rtl_srcs = []
+        jobs = {}
         for name, hjson_input_fn in self.find_xbars():
             print(f"Generating TL-UL crossbar switch xbar_{name}...")
             pkg_sv = cwd / f"tl_{name}_pkg.sv"
             rtl_sv = cwd / f"xbar_{name}.sv"
-            run_tlgen(hjson_input_fn, rtl_sv, pkg_sv)
+            jobs[hjson_input_fn.name] = (run_tlgen, (hjson_input_fn, rtl_sv, pkg_sv))
 
             r.rtl_srcs += [pkg_sv, rtl_sv]
+        run_generators(jobs, self.processes)
         return r
@@ -264,6 +264,111 @@ module rvlab_test_utils(
     end
   endtask
   
+  // Binary delta file (see flow/tools/elf2mem.py): magic "RVLD", then
+  // per burst: start address, number of words, words (all 32-bit big-endian).
+  localparam bit [31:0] delta_bin_magic = "RVLD";
+
+  function automatic bit is_delta_bin(string delta_filename);
+    bit [31:0] magic;
+    int f;
+    int r;
+
+    f = $fopen(delta_filename, "rb");
+    r = $fread(magic, f);
+    $fclose(f);
+    return (r == 4) && (magic == delta_bin_magic);
+  endfunction
+
+  // Writes consecutive words starting at waddr: the address is sent once, the
+  // SBData0 writes follow without polling sbbusy (each DMI write takes far
+  // longer than the system bus write it starts). sbbusy, sbbusyerror and
+  // sberror are checked once at the end. If a write hit a busy SBA, the
+  // burst is written again word by word with polling.
+  task dm_sba_write_burst(input logic [31:0] waddr, input bit [31:0] wdata[], inout int errcnt);
+    dm::sbcs_t status;
+    dm::sbcs_t clear;
+    logic [31:0] addr;
+
+    if (sbcs.sbreadonaddr || (!sbcs.sbautoincrement)) begin
+      sbcs.sbreadonaddr = '0;
+      sbcs.sbautoincrement = '1;
+      tu.dmi_write(dm::SBCS, sbcs, errcnt);
+    end
+
+    tu.dmi_write(dm::SBAddress0, waddr, errcnt);
+    foreach (wdata[i]) begin
+      tu.dmi_write(dm::SBData0, wdata[i], errcnt);
+    end
+
+    do begin
+      tu.dmi_read(dm::SBCS, status, errcnt);
+    end while(status.sbbusy);
+
+    if (status.sbbusyerror || (status.sberror != '0)) begin
+      // sbbusyerror and sberror are write-1-to-clear
+      clear = sbcs;
+      clear.sbbusyerror = status.sbbusyerror;
+      clear.sberror = status.sberror;
+      tu.dmi_write(dm::SBCS, clear, errcnt);
+      if (status.sberror != '0) begin
+        $error("dm_sba_write_burst: system bus error %0d in burst at %08x.", status.sberror, waddr);
+        errcnt++;
+      end
+      else begin
+        $display("dm_sba_write_burst: SBA busy during burst at %08x, writing it again word by word.", waddr);
+        addr = waddr;
+        foreach (wdata[i]) begin
+          dm_sba_write_successive(addr, wdata[i], i == 0, errcnt);
+          addr += 4;
+        end
+      end
+    end
+  endtask
+
+  // Loads a binary delta file, writing each run of words as one SBA burst
+  // (see dm_sba_write_burst).
+  task dm_load_delta_bin(string delta_filename, inout int errcnt);
+    bit [31:0] magic;
+    bit [31:0] addr;
+    bit [31:0] count;
+    bit [31:0] words[];
+    bit [31:0] i;
+    int f;
+    int r;
+
+    f = $fopen(delta_filename, "rb");
+    r = $fread(magic, f);
+
+    while(1) begin
+      r = $fread(addr, f);
+      if(r == 0)
+        break;
+      r += $fread(count, f);
+      if(r != 8) begin
+        $error("dm_load_delta_bin: truncated burst header in delta file.");
+        errcnt++;
+        break;
+      end
+      words = new[count];
+      for(i=0;i<count;i++) begin
+        r = $fread(words[i], f);
+        if(r != 4) begin
+          $error("dm_load_delta_bin: truncated burst data in delta file.");
+          errcnt++;
+          break;
+        end
+      end
+      if(i != count)
+        break;
+      if(verbose_dmi)
+        $display("dm_load_delta_bin: write %0d words at %08x", count, addr);
+      dm_sba_write_burst(addr, words, errcnt);
+    end
+
+    $fclose(f);
+
+  endtask
+
   task dm_load_delta(string delta_filename, inout int errcnt);
     bit [31:0] wdata;
     bit [31:0] addr;
@@ -273,6 +378,11 @@ module rvlab_test_utils(
     int f;
     int r;
 
+    if(is_delta_bin(delta_filename)) begin
+      dm_load_delta_bin(delta_filename, errcnt);
+      return;
+    end
+
     f = $fopen(delta_filename, "r");
 
     send_addr = '1;